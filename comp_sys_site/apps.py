@@ -1,6 +1,30 @@
+import gc
+import logging
+import os
+
 from django.apps import AppConfig
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 
 class CompSysSiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'comp_sys_site'
+
+    def ready(self):
+        # opt-in, as management commands and tests set up the app too
+        if os.getenv('warm_up_snapshot', '').lower() not in ('1', 'true', 'yes'):
+            return
+
+        from comp_sys_site.services.data_getters import warm_up
+        from comp_sys_site.views import ROW_LIMIT
+
+        try:
+            warm_up(ROW_LIMIT)
+        except Exception as e:
+            logger.error(f"Snapshot warm-up failed, the first requests will build it: {str(e)}")
+            return
+        # keep the collector from writing to the warmed-up objects, so forked workers share their pages
+        gc.freeze()
@@ -0,0 +1,78 @@
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comp_sys_site.services.columnar_index import ColumnarIndex
+from comp_sys_site.services.file_utils import file_utilities
+from comp_sys_site.services.records import SchoolRecords
+
+representations = ('dict_tree', 'records', 'records_binary')
+
+
+def _resident_bytes() -> int:
+    """The resident set size of this process, or its peak where /proc is not available."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _measure(path: str, representation: str) -> dict:
+    """Loads the snapshot in one representation, in a fresh process, and reports what it keeps resident."""
+    gc.collect()
+    resident_before = _resident_bytes()
+    tracemalloc.start()
+
+    if representation == 'dict_tree':
+        with open(path, 'r', encoding='utf-8') as file:
+            snapshot_data = json.load(file)
+    elif representation == 'records':
+        snapshot_data = SchoolRecords(ColumnarIndex.from_school_items(file_utilities.iter_json_object_items(path)))
+    else:
+        index = ColumnarIndex.load(file_utilities.get_binary_index_path(path), source_path=path)
+        if index is None:
+            tracemalloc.stop()
+            return {'skipped': "no binary index, run convert_snapshot first"}
+        # touch every page, as serving the full ranking does
+        for field in ColumnarIndex.array_fields:
+            getattr(index, field).sum()
+        snapshot_data = SchoolRecords(index)
+
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {'schools': len(snapshot_data), 'retained': retained, 'peak': peak,
+              'resident': _resident_bytes() - resident_before}
+    del snapshot_data
+    return result
+
+
+class Command(BaseCommand):
+    help = ("Measures the memory a snapshot keeps resident as the nested dict tree, as School/Author records over the "
+            "columnar index, and as records over the memory-mapped binary index, each loaded in a fresh process.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Snapshot file to measure (defaults to the current snapshot)")
+
+    def handle(self, *args, **options):
+        path = options['path'] or file_utilities.get_current_file_path()
+        if not path or not os.path.exists(path):
+            raise CommandError(f"Snapshot file not found: {path}")
+
+        self.stdout.write(f"{os.path.basename(path)}, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        self.stdout.write(f"{'representation':<18}{'retained (MiB)':>16}{'peak (MiB)':>12}{'resident (MiB)':>16}")
+        context = multiprocessing.get_context('spawn')
+        for representation in representations:
+            with context.Pool(1) as pool:
+                result = pool.apply(_measure, (path, representation))
+            if 'skipped' in result:
+                self.stdout.write(f"{representation:<18}skipped, {result['skipped']}")
+                continue
+            self.stdout.write(f"{representation:<18}{result['retained'] / 2 ** 20:>16.1f}"
+                              f"{result['peak'] / 2 ** 20:>12.1f}{result['resident'] / 2 ** 20:>16.1f}")
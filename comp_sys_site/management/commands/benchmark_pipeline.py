@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comp_sys_site.services.all_conferences import conferences
+from comp_sys_site.services.area_conference_mapping import categorize_venue
+from comp_sys_site.services.author_distribution import AuthorDistributionStore
+from comp_sys_site.services.columnar_index import ColumnarIndex
+from comp_sys_site.services.data_getters import filter_snapshot_data, get_ranking
+from comp_sys_site.services.data_processing import DataProcessing, data_processor, non_area_keys
+from comp_sys_site.services.date_time_utils import get_current_year
+from comp_sys_site.services.file_utils import Snapshot, file_utilities
+from comp_sys_site.services.parallel_filter import ShardedSchoolFilter
+from comp_sys_site.services.result_cache import ranking_query_cache
+from comp_sys_site.services.serializers import json_serializer
+from comp_sys_site.services.synthetic_snapshot import GENERATOR_VERSION, generate_snapshot, write_snapshot
+
+# a stage this much slower than in the previous run on the same dataset is reported as a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+def legacy_filter_author_areas(school_data):
+    """The per-author top area detection filter_author_areas used to do, with find_max_with_proximity."""
+    for uni_data in school_data.values():
+        for author_data in uni_data['authors'].values():
+            areas = [area for area in author_data if area not in non_area_keys]
+            top_scores = data_processor.find_max_with_proximity([author_data[area] for area in areas], proximity=5)
+            author_data['top_areas'] = [area for area in areas if author_data[area] in top_scores]
+
+
+class Command(BaseCommand):
+    help = ("Times each stage of the ranking pipeline, from loading a snapshot to serving an author distribution, on "
+            "a synthetic snapshot (or a given one), and records the results to compare them across commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=400, help="Schools in the synthetic snapshot")
+        parser.add_argument('--authors', type=int, default=40, help="Mean authors per school in the synthetic snapshot")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic snapshot")
+        parser.add_argument('--snapshot', help="Benchmark this all-school-scores file instead of a synthetic one")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage; the fastest is kept")
+        parser.add_argument('--output', default='benchmark_results.jsonl',
+                            help="File the results are appended to, one JSON object per run")
+        parser.add_argument('--no-record', action='store_true', help="Print the results without recording them")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Also time the full filter sharded across this many processes (at least 2)")
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp()
+        try:
+            if options['snapshot']:
+                if not os.path.exists(options['snapshot']):
+                    raise CommandError(f"Snapshot file not found: {options['snapshot']}")
+                path = options['snapshot']
+                dataset = {'snapshot': os.path.basename(path), 'size': os.path.getsize(path)}
+            else:
+                path = write_snapshot(work_dir, generate_snapshot(options['schools'], options['authors'],
+                                                                  options['seed']))
+                dataset = {'schools': options['schools'], 'authors': options['authors'], 'seed': options['seed'],
+                           'generator': GENERATOR_VERSION}
+
+            stages = self.run_stages(path, work_dir, options['repeat'], options['workers'])
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        previous = self.previous_result(options['output'], dataset)
+        self.report(stages, previous)
+        if not options['no_record']:
+            record = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': self.git_commit(),
+                      'dataset': dataset, 'stages': stages}
+            with open(options['output'], 'a', encoding='utf-8') as file:
+                file.write(json.dumps(record) + '\n')
+            self.stdout.write(f"Recorded to {options['output']}")
+
+    def run_stages(self, path: str, work_dir: str, repeat: int, workers: int = 0) -> dict:
+        stages = {}
+
+        def measure(name, function):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = function()
+                timings.append(time.perf_counter() - start)
+            stages[name] = min(timings)
+            return result
+
+        current_year = get_current_year()
+        areas = {categorize_venue.categorize_venue(conf) for conf in conferences}
+
+        # load
+        data = measure('load_json', lambda: file_utilities.read_dict_from_file(path))
+        measure('load_streaming', lambda: ColumnarIndex.from_school_items(file_utilities.iter_json_object_items(path)))
+        index = measure('build_index', lambda: ColumnarIndex.from_school_data(data))
+        binary_path = os.path.join(work_dir, 'binary')
+        index.save(binary_path, source_path=path)
+        measure('load_binary', lambda: ColumnarIndex.load(binary_path, source_path=path))
+
+        snapshot = Snapshot(path, data, os.stat(path))
+        snapshot.attach('columnar_index', index)
+
+        # filter every conference over every year, the heaviest query
+        measure('filter_reference', lambda: DataProcessing().filter_school_data(data, conferences, areas, 1970,
+                                                                                current_year))
+        filtered = measure('filter', lambda: filter_snapshot_data(conferences, 1970, current_year, snapshot,
+                                                                  display_names=True, include_top_areas=True))
+        measure('filter_summary', lambda: filter_snapshot_data(conferences, 1970, current_year, snapshot,
+                                                               include_breakdown=False, display_names=True))
+        if workers > 1:
+            school_filter = ShardedSchoolFilter(workers=workers, min_cells=0)
+            try:
+                # the first run also starts the pool, only the fastest run is kept
+                measure('filter_sharded', lambda: school_filter.filter_school_data(
+                    index, binary_path, path, True, needed_conferences=conferences, needed_areas=areas,
+                    low_year=1970, high_year=current_year, include_top_areas=True))
+            finally:
+                school_filter.shutdown()
+
+        # score, sort and serialize the full result
+        measure('score', lambda: data_processor.add_average_counts(filtered))
+        ranking = measure('sort', lambda: data_processor.sort_authors_by_total_score(
+            data_processor.sort_institutions_by_average_count(filtered)))
+        measure('serialize', lambda: json_serializer.dumps({'sorted_ranks': ranking}))
+
+        # top areas of every author, one by one and in one batch
+        measure('top_areas_legacy', lambda: legacy_filter_author_areas(ranking))
+        measure('top_areas', lambda: data_processor.filter_author_areas(ranking))
+
+        # a query as the site serves it: a cold ranking and its first page
+        def first_page():
+            ranking_query_cache.clear()
+            return get_ranking(conferences, 1970, current_year, snapshot).page(0, 300)
+        measure('ranking_page', first_page)
+
+        # the publication distribution of every author, per lookup
+        store = measure('author_distribution_build', lambda: AuthorDistributionStore.from_ranking(ranking))
+        pairs = [(institution, author) for institution, data in ranking.items() for author in data['authors']]
+        measure('author_distribution_lookup', lambda: [store.get(*pair) for pair in pairs])
+        stages['author_distribution_lookup'] /= max(1, len(pairs))
+
+        return stages
+
+    @staticmethod
+    def previous_result(output: str, dataset: dict) -> dict | None:
+        if not os.path.exists(output):
+            return None
+        previous = None
+        with open(output, 'r', encoding='utf-8') as file:
+            for line in file:
+                record = json.loads(line)
+                if record.get('dataset') == dataset:
+                    previous = record
+        return previous
+
+    def report(self, stages: dict, previous: dict | None):
+        if previous:
+            self.stdout.write(f"Compared with {previous['commit'] or 'unknown commit'} ({previous['timestamp']})")
+        self.stdout.write(f"{'stage':<28}{'time (ms)':>12}{'change':>10}")
+        for name, seconds in stages.items():
+            line = f"{name:<28}{seconds * 1000:>12.3f}"
+            before = (previous or {}).get('stages', {}).get(name)
+            if before:
+                change = seconds / before - 1
+                line += f"{change:>+10.0%}"
+                if change > REGRESSION_THRESHOLD:
+                    line = self.style.WARNING(line + "  slower")
+            self.stdout.write(line)
+
+    @staticmethod
+    def git_commit() -> str | None:
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
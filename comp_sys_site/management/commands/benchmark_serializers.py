@@ -0,0 +1,64 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comp_sys_site.services.all_conferences import conferences
+from comp_sys_site.services.data_getters import filter_snapshot_data
+from comp_sys_site.services.data_processing import data_processor
+from comp_sys_site.services.date_time_utils import get_current_year
+from comp_sys_site.services.file_utils import snapshot_cache
+from comp_sys_site.services.serializers import get_serializer, serializers
+
+
+def legacy_dumps(data) -> bytes:
+    """The serialization views.home used to do: a Decimal-converting copy of the data, then json.dumps."""
+    data_processor.convert_decimals_to_float(data)
+    return json.dumps(data).encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = "Times the JSON serializers, and their memory allocations, on the full default ranking of the snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per serializer; the fastest is kept")
+
+    def measure(self, dumps, data, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = dumps(data)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        dumps(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return min(timings), peak, len(body)
+
+    def handle(self, *args, **options):
+        snapshot = snapshot_cache.get()
+        if not snapshot:
+            raise CommandError("No snapshot file found")
+
+        # every school with its authors and their full per-venue, per-year breakdown
+        filtered = filter_snapshot_data(conferences, 1970, get_current_year(), snapshot, display_names=True,
+                                        include_top_areas=True)
+        data_processor.add_average_counts(filtered)
+        sorted_school_ranks = data_processor.sort_authors_by_total_score(
+            data_processor.sort_institutions_by_average_count(filtered))
+        data = {'sorted_ranks': sorted_school_ranks}
+
+        candidates = {'legacy': legacy_dumps}
+        for name in serializers:
+            try:
+                candidates[name] = get_serializer(name).dumps
+            except ValueError as e:
+                self.stdout.write(self.style.WARNING(f"Skipping {name}: {e}"))
+
+        self.stdout.write(f"{len(sorted_school_ranks)} schools, best of {options['repeat']} runs")
+        self.stdout.write(f"{'serializer':<12}{'time (ms)':>12}{'peak alloc (MB)':>18}{'size (MB)':>12}")
+        for name, dumps in candidates.items():
+            seconds, peak, size = self.measure(dumps, data, options['repeat'])
+            self.stdout.write(f"{name:<12}{seconds * 1000:>12.1f}{peak / 2 ** 20:>18.1f}{size / 2 ** 20:>12.2f}")
@@ -0,0 +1,24 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comp_sys_site.services.columnar_index import ColumnarIndex
+from comp_sys_site.services.file_utils import file_utilities
+
+
+class Command(BaseCommand):
+    help = "Converts an all-school-scores snapshot into the binary index that workers memory-map at load time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Snapshot file to convert (defaults to the current snapshot)")
+
+    def handle(self, *args, **options):
+        path = options['path'] or file_utilities.get_current_file_path()
+        if not path or not os.path.exists(path):
+            raise CommandError(f"Snapshot file not found: {path}")
+
+        index = ColumnarIndex.from_school_items(file_utilities.iter_json_object_items(path))
+        binary_path = file_utilities.get_binary_index_path(path)
+        os.makedirs(os.path.dirname(binary_path), exist_ok=True)
+        index.save(binary_path, source_path=path)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {binary_path} ({len(index.row_year)} rows)"))
@@ -0,0 +1,100 @@
+import copy
+import os
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comp_sys_site.services.all_conferences import conferences
+from comp_sys_site.services.area_conference_mapping import categorize_venue
+from comp_sys_site.services.data_getters import get_ranking
+from comp_sys_site.services.date_time_utils import get_current_year
+from comp_sys_site.services.file_utils import Snapshot, file_utilities, snapshot_cache
+from comp_sys_site.services.reference_pipeline import ReferencePipeline
+
+
+class Command(BaseCommand):
+    help = ("Checks the rankings served from the fixed-point index against the original dict-walking pipeline, "
+            "frozen as ReferencePipeline, for the default query, every single area and random queries.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshot', help="Verify this all-school-scores file instead of the current snapshot")
+        parser.add_argument('--random', type=int, default=10, help="Random queries to verify")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the random queries")
+        parser.add_argument('--tolerance', type=float, default=1e-6,
+                            help="Largest accepted difference of a score or an average count")
+
+    def queries(self, count: int, seed: int):
+        current_year = get_current_year()
+        yield 'default', conferences, 1970, current_year
+
+        area_conferences = {}
+        for conf in conferences:
+            area_conferences.setdefault(categorize_venue.categorize_venue(conf), []).append(conf)
+        for area, confs in area_conferences.items():
+            if area is not None:
+                yield area, confs, 1970, current_year
+
+        rnd = random.Random(seed)
+        for i in range(count):
+            start_year = rnd.randint(1970, current_year)
+            yield (f'random {i + 1}', rnd.sample(conferences, rnd.randint(1, len(conferences))), start_year,
+                   rnd.randint(start_year, current_year))
+
+    @staticmethod
+    def reference_ranking(data: dict, required_conferences, start_year, end_year) -> dict:
+        data_processor = ReferencePipeline()
+        areas = {categorize_venue.categorize_venue(conf) for conf in required_conferences}
+        filtered = data_processor.filter_school_data(copy.deepcopy(data), required_conferences, areas, start_year,
+                                                     end_year)
+        return data_processor.sort_institutions_by_average_count(data_processor.format_university_data(filtered))
+
+    def handle(self, *args, **options):
+        if options['snapshot']:
+            path = options['snapshot']
+            if not os.path.exists(path):
+                raise CommandError(f"Snapshot file not found: {path}")
+            snapshot = Snapshot(path, file_utilities.read_dict_from_file(path), os.stat(path))
+        else:
+            snapshot = snapshot_cache.get()
+            if not snapshot:
+                raise CommandError("No snapshot file found")
+
+        # the reference walks the raw file, not the columnar index, so anything lost on ingest shows up as a difference
+        data = file_utilities.read_dict_from_file(snapshot.path)
+        if not data:
+            raise CommandError(f"Unable to read snapshot file {snapshot.path}")
+        tolerance = options['tolerance']
+        failures = 0
+        self.stdout.write(f"{'query':<40}{'schools':>8}{'max score diff':>16}{'max average diff':>18}{'moved':>7}")
+        for name, required_conferences, start_year, end_year in self.queries(options['random'], options['seed']):
+            expected = self.reference_ranking(data, required_conferences, start_year, end_year)
+            ranking = get_ranking(required_conferences, start_year, end_year, snapshot)
+            actual = ranking.page(0, len(ranking))
+
+            score_diff, average_diff = 0.0, 0.0
+            for institution, expected_data in expected.items():
+                actual_data = actual.get(institution)
+                if actual_data is None or set(actual_data['area_scores']) != set(expected_data['area_scores']):
+                    score_diff = float('inf')
+                    continue
+                for area, score in expected_data['area_scores'].items():
+                    score_diff = max(score_diff, abs(actual_data['area_scores'][area] - score))
+                average_diff = max(average_diff, abs(actual_data['average_count'] - expected_data['average_count']))
+
+            # schools whose averages are within the tolerance of each other may swap places
+            expected_counts = [expected_data['average_count'] for expected_data in expected.values()]
+            actual_counts = [expected[institution]['average_count'] if institution in expected else float('nan')
+                             for institution in actual]
+            moved = sum(abs(expected_count - actual_count) > tolerance
+                        for expected_count, actual_count in zip(expected_counts, actual_counts))
+            moved += abs(len(expected) - len(actual))
+
+            line = f"{name[:39]:<40}{len(expected):>8}{score_diff:>16.2e}{average_diff:>18.2e}{moved:>7}"
+            if score_diff > tolerance or average_diff > tolerance or moved:
+                failures += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if failures:
+            raise CommandError(f"{failures} queries differ from the reference pipeline")
+        self.stdout.write(self.style.SUCCESS("All rankings match the reference pipeline"))
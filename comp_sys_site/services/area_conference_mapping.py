@@ -1,3 +1,19 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet
+
+# hyphens, slashes and runs of whitespace all separate the words of a venue name
+_SEPARATORS = re.compile(r'[\s/-]+')
+# proceedings split into volumes, e.g. 'ASPLOS (2)', belong to the same venue
+_VOLUME_SUFFIX = re.compile(r'\s*\(\d+\)\s*$')
+
+
+@lru_cache(maxsize=1024)
+def normalize_venue(venue: str) -> str:
+    """Returns the lookup key of a venue name: separators folded to single spaces, case folded, volume dropped."""
+    return _SEPARATORS.sub(' ', _VOLUME_SUFFIX.sub('', venue)).strip().casefold()
+
+
 class CategorizeVenue:
     def __init__(self):
         self.area_to_conference_map = {
@@ -59,7 +75,7 @@ class CategorizeVenue:
                 'OSDI',
                 'EuroSys',
                 'USENIX Annual Technical Conference',
-                'USENIX ATC'
+                'USENIX ATC',
                 'USENIX FAST',
                 'FAST'
             ],
@@ -85,25 +101,38 @@ class CategorizeVenue:
             ]
         }
 
+        # other names a venue is listed under, mapped to the name used in area_to_conference_map
+        self.venue_aliases = {
+            'USENIX ATC Short': 'USENIX ATC'
+        }
+
+        self.venue_to_area: Dict[str, str] = {}
+        for area, confs in self.area_to_conference_map.items():
+            for conf in confs:
+                key = normalize_venue(conf)
+                if self.venue_to_area.setdefault(key, area) != area:
+                    raise ValueError(f"Venue {conf} is mapped to both {self.venue_to_area[key]} and {area}")
+        for alias, conf in self.venue_aliases.items():
+            self.venue_to_area[normalize_venue(alias)] = self.venue_to_area[normalize_venue(conf)]
+
+        self.area_to_venue_keys: Dict[str, FrozenSet[str]] = {
+            area: frozenset(key for key, key_area in self.venue_to_area.items() if key_area == area)
+            for area in self.area_to_conference_map
+        }
+
     def categorize_venue(self, venue: str) -> str | None:
         if not venue:
             return None
 
-        if '-' in venue:
-            venue = venue.replace("-", " ")
-        elif 'ESEC-SIGSOFT-FSE' in venue:
-            venue = 'ESEC/SIGSOFT FSE'
-
         # Check if venue is a list and convert it to a string
         if isinstance(venue, list):
             venue = ', '.join(venue)
 
-        for area, confs in self.area_to_conference_map.items():
-            for conf in confs:
-                if venue.casefold() == conf.casefold():
-                    return area
+        return self.venue_to_area.get(normalize_venue(venue))
 
-        return None
+    def venues_in_area(self, area: str) -> FrozenSet[str]:
+        """Returns the normalized names of every venue, alias included, that belongs to area."""
+        return self.area_to_venue_keys.get(area, frozenset())
 
 
 categorize_venue = CategorizeVenue()
@@ -0,0 +1,42 @@
+from typing import Dict, Iterable
+
+from comp_sys_site.services.all_conferences import all_areas
+
+
+class AuthorDistributionStore:
+    """
+    Publication count per area for every (institution, author) pair of a ranking, looked up in O(1).
+
+    Only the areas an author actually has are stored; the missing ones are filled with 0 when a lookup is answered.
+    """
+
+    def __init__(self, areas: Iterable[str] = all_areas):
+        self.areas = tuple(areas)
+        self._distributions = {}
+
+    @classmethod
+    def from_ranking(cls, sorted_school_ranks: Dict, areas: Iterable[str] = all_areas) -> 'AuthorDistributionStore':
+        store = cls(areas)
+        for institution, institution_data in sorted_school_ranks.items():
+            for author, author_data in institution_data['authors'].items():
+                store.add(institution, author, author_data['area_paper_counts'])
+        return store
+
+    def add(self, institution: str, author: str, area_paper_counts: Dict):
+        self._distributions[(institution, author)] = {
+            area: area_data.get('area_paper_count', 0)
+            for area, area_data in area_paper_counts.items()
+            if area != 'area_adjusted_score' and area != 'area_paper_count'
+        }
+
+    def get(self, institution: str, author: str) -> Dict | None:
+        counts = self._distributions.get((institution, author))
+        if counts is None:
+            return None
+
+        pub_distribution = {area: 0 for area in self.areas}
+        pub_distribution.update(counts)
+        return pub_distribution
+
+    def __len__(self):
+        return len(self._distributions)
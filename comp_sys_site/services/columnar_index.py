@@ -0,0 +1,496 @@
+import json
+import logging
+import os
+import shutil
+import time
+from array import array
+from typing import Dict, Iterable, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from comp_sys_site.services.data_processing import data_processor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+BINARY_FORMAT_VERSION = 3
+
+# scores are summed as integer multiples of 10 ** -decimals when they have at most this many decimals
+MAX_SCORE_DECIMALS = 6
+
+
+class YearPrefixSums(NamedTuple):
+    """
+    Cumulative-by-year totals of groups of rows. Group g owns positions offset[g] .. offset[g] + span[g]; the first one
+    is always 0 and position k holds the total of the years min_year[g] .. min_year[g] + k - 1. Scores are in score
+    units, see ColumnarIndex.score_units.
+    """
+    min_year: np.ndarray
+    span: np.ndarray
+    offset: np.ndarray
+    score: np.ndarray
+    papers: np.ndarray
+    leaves: np.ndarray
+
+
+def group_starts(keys: np.ndarray) -> np.ndarray:
+    """Returns the positions where a run of equal keys starts."""
+    starts_mask = np.ones(len(keys), dtype=bool)
+    starts_mask[1:] = keys[1:] != keys[:-1]
+    return np.flatnonzero(starts_mask)
+
+
+def score_scale(scores: np.ndarray) -> int | None:
+    """
+    Returns the smallest power of ten that turns every score into an integer, so that sums of scores can be computed
+    exactly, in any order, as sums of integer units.
+
+    :return: The scale, or None if some score has more than MAX_SCORE_DECIMALS decimals and cannot be represented
+        exactly: such scores are not rounded, they are summed as floats.
+    """
+    for decimals in range(MAX_SCORE_DECIMALS + 1):
+        scaled = scores * 10 ** decimals
+        if np.allclose(scaled, np.rint(scaled), rtol=0, atol=1e-6):
+            return 10 ** decimals
+    logger.warning(f"Scores have more than {MAX_SCORE_DECIMALS} decimals, summing them as floats")
+    return None
+
+
+def year_prefix_sums(starts: np.ndarray, years: np.ndarray, score_units: np.ndarray,
+                     papers: np.ndarray) -> YearPrefixSums:
+    """
+    Builds the cumulative-by-year score, paper and leaf counts of contiguous groups of rows.
+
+    :param starts: The first row of each group; the rows of a group are contiguous, in any year order.
+    :param years: The year of each row.
+    :param score_units: The score of each row, in score units: integer sums are rounded back to integers.
+    :param papers: The paper count of each row.
+    """
+    n_rows = len(years)
+    row_group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n_rows)))
+
+    if n_rows:
+        min_year = np.minimum.reduceat(years, starts)
+        max_year = np.maximum.reduceat(years, starts)
+    else:
+        min_year = max_year = np.zeros(0, dtype=np.int16)
+
+    span = max_year.astype(np.int64) - min_year + 1
+    lengths = span + 1
+    offset = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    size = int(lengths.sum())
+
+    row_position = offset[row_group] + (years - min_year[row_group]) + 1
+    cum_score = np.bincount(row_position, weights=score_units, minlength=size)
+    if np.issubdtype(score_units.dtype, np.integer):
+        # bincount adds the integer units as doubles, which is exact below 2 ** 53
+        cum_score = np.rint(cum_score).astype(np.int64)
+    cum_papers = np.bincount(row_position, weights=papers, minlength=size)
+    cum_papers = np.rint(cum_papers).astype(np.int32)
+    cum_leaves = np.bincount(row_position, minlength=size).astype(np.int32)
+
+    # accumulate one year step at a time across all groups so every running total stays local to its group
+    for step in range(1, int(lengths.max(initial=1))):
+        positions = offset[lengths > step] + step
+        cum_score[positions] += cum_score[positions - 1]
+        cum_papers[positions] += cum_papers[positions - 1]
+        cum_leaves[positions] += cum_leaves[positions - 1]
+
+    return YearPrefixSums(min_year, span, offset, cum_score, cum_papers, cum_leaves)
+
+
+def year_range_positions(min_year: np.ndarray, span: np.ndarray, offset: np.ndarray, low_year: int,
+                         high_year: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the prefix-sum positions bounding low_year .. high_year in each group: the group's total over the range is
+    the cumulative value at high minus the one at low.
+    """
+    min_year = min_year.astype(np.int64)
+    low = offset + np.clip(low_year - min_year, 0, span)
+    high = np.maximum(offset + np.clip(high_year - min_year + 1, 0, span), low)
+    return low, high
+
+
+class ColumnarIndex:
+    """
+    Column-oriented copy of an all-school-scores snapshot.
+
+    Every (author, area, venue, year) leaf of the nested snapshot becomes one row of parallel NumPy arrays. Rows are
+    stored in the same order as the nested dicts were walked, so a masked group-by over them reproduces the sums and
+    the key order of DataProcessing.filter_school_data.
+
+    The rows of one (author, area, venue) cell are contiguous. Each cell also gets cumulative-by-year score, paper and
+    leaf counts over its own first..last year, so the total for any year range is two lookups per cell.
+
+    When every score has at most MAX_SCORE_DECIMALS decimals, sums of scores are kept as integers, in units of
+    1 / score_scale, so they are exact whatever the order they are added in, and are only turned back into floats
+    when a result is built. Otherwise exact_scores is False and scores are summed as floats, accurate to the rounding
+    of float additions but dependent on their order.
+    """
+
+    # everything needed to answer queries; written as one .npy file each by save()
+    array_fields = (
+        'school_author_start', 'author_school', 'row_author', 'row_area', 'row_venue', 'row_year', 'row_score',
+        'row_papers', 'row_school', 'cell_row_start', 'cell_author', 'cell_area', 'cell_venue', 'cell_min_year',
+        'cell_span', 'cell_offset', 'cum_score', 'cum_papers', 'cum_leaves'
+    )
+    list_fields = ('school_names', 'school_author_counts', 'author_names', 'author_dblp_links', 'area_names',
+                   'venue_names')
+
+    def __init__(self):
+        self.school_names = []
+        self.school_author_counts = []
+        self.author_names = []
+        self.author_dblp_links = []
+        self.area_names = []
+        self.area_ids = {}
+        self.venue_names = []
+        self.venue_ids = {}
+
+        # filled in by _add_school and handed to NumPy without a copy by _finalize
+        self._school_author_start = [0]
+        self._row_author, self._row_area, self._row_venue = array('i'), array('h'), array('h')
+        self._row_year, self._row_score, self._row_papers = array('h'), array('d'), array('q')
+
+    @classmethod
+    def from_school_data(cls, school_data: Dict) -> 'ColumnarIndex':
+        return cls.from_school_items(school_data.items())
+
+    @classmethod
+    def from_school_items(cls, school_items: Iterable[Tuple[str, Dict]]) -> 'ColumnarIndex':
+        """
+        Builds the index from (school, school data) pairs. Each school is flattened as soon as it is received, so the
+        pairs can come from a streaming parser without the whole snapshot ever being held as nested dicts.
+        """
+        start = time.perf_counter()
+        index = cls()
+        for school, data in school_items:
+            index._add_school(school, data)
+        index._finalize()
+        logger.info(f"Built columnar index with {len(index.row_year)} rows for {len(index.school_names)} schools "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return index
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'ColumnarIndex':
+        # snapshots loaded as SchoolRecords already sit on their index
+        index = getattr(snapshot.data, 'index', None)
+        return index if isinstance(index, cls) else cls.from_school_data(snapshot.data)
+
+    @staticmethod
+    def _source_identity(source_path: str) -> Dict:
+        stat_result = os.stat(source_path)
+        return {'name': os.path.basename(source_path), 'size': stat_result.st_size,
+                'mtime_ns': stat_result.st_mtime_ns}
+
+    def save(self, directory: str, source_path: str):
+        """
+        Writes the index as a directory of .npy files plus a meta.json holding the name tables and the identity of
+        the JSON snapshot it was built from. The directory is assembled under a temporary name and renamed into place.
+        """
+        temp_directory = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        os.makedirs(temp_directory)
+
+        for field in self.array_fields:
+            np.save(os.path.join(temp_directory, f"{field}.npy"), np.ascontiguousarray(getattr(self, field)))
+        meta = {'format_version': BINARY_FORMAT_VERSION, 'source': self._source_identity(source_path),
+                'score_scale': self.score_scale, 'exact_scores': self.exact_scores}
+        meta.update({field: getattr(self, field) for field in self.list_fields})
+        with open(os.path.join(temp_directory, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(temp_directory, directory)
+        logger.info(f"Wrote binary index for {source_path} to {directory}")
+
+    @classmethod
+    def load(cls, directory: str, source_path: str | None = None) -> 'ColumnarIndex | None':
+        """
+        Memory-maps an index written by save(). The arrays stay read-only views of the files, so every worker process
+        shares the same pages through the OS page cache.
+
+        :param directory: The directory written by save().
+        :param source_path: When given, the index is only used if it was built from this exact file (name, size and
+            modification time).
+        :return: The index, or None if it is missing, from another format version or built from another file.
+        """
+        try:
+            with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            if meta.get('format_version') != BINARY_FORMAT_VERSION:
+                logger.warning(f"Ignoring binary index {directory} with format {meta.get('format_version')}")
+                return None
+            if source_path is not None and meta.get('source') != cls._source_identity(source_path):
+                logger.warning(f"Ignoring binary index {directory}, it was built from a different file")
+                return None
+
+            index = cls.__new__(cls)
+            index.score_scale, index.exact_scores = meta['score_scale'], meta['exact_scores']
+            for field in cls.list_fields:
+                setattr(index, field, meta[field])
+            for field in cls.array_fields:
+                setattr(index, field, np.load(os.path.join(directory, f"{field}.npy"), mmap_mode='r'))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Unable to load binary index {directory}: {str(e)}")
+            return None
+
+        index.area_ids = {name: i for i, name in enumerate(index.area_names)}
+        index.venue_ids = {name: i for i, name in enumerate(index.venue_names)}
+        return index
+
+    @staticmethod
+    def _intern(name: str, names: list, ids: dict) -> int:
+        name_id = ids.get(name)
+        if name_id is None:
+            name_id = ids[name] = len(names)
+            names.append(name)
+        return name_id
+
+    def _add_school(self, school: str, data: Dict):
+        self.school_names.append(school)
+        self.school_author_counts.append(data.get('author_count'))
+
+        for author, author_data in (data.get('authors') or {}).items():
+            author_id = len(self.author_names)
+            self.author_names.append(author)
+            self.author_dblp_links.append(author_data.get('dblp_link'))
+
+            for area, area_data in (author_data.get('area_paper_counts') or {}).items():
+                area_id = self._intern(area, self.area_names, self.area_ids)
+                for venue, venue_data in area_data.items():
+                    if not isinstance(venue_data, dict):
+                        continue
+                    venue_id = self._intern(venue, self.venue_names, self.venue_ids)
+                    for year, year_data in venue_data.items():
+                        self._row_author.append(author_id)
+                        self._row_area.append(area_id)
+                        self._row_venue.append(venue_id)
+                        self._row_year.append(int(year))
+                        self._row_score.append(year_data.get('score', 0))
+                        self._row_papers.append(year_data.get('year_paper_count', 0))
+
+        self._school_author_start.append(len(self.author_names))
+
+    def _finalize(self):
+        self.school_author_start = np.array(self._school_author_start, dtype=np.int32)
+        self.author_school = np.repeat(np.arange(len(self.school_names), dtype=np.int32),
+                                       np.diff(self.school_author_start))
+        self.row_author = np.frombuffer(self._row_author, dtype=np.int32)
+        self.row_area = np.frombuffer(self._row_area, dtype=np.int16)
+        self.row_venue = np.frombuffer(self._row_venue, dtype=np.int16)
+        self.row_year = np.frombuffer(self._row_year, dtype=np.int16)
+        self.row_score = np.frombuffer(self._row_score, dtype=np.float64)
+        self.row_papers = np.frombuffer(self._row_papers, dtype=np.int64)
+        self.row_school = self.author_school[self.row_author]
+        scale = score_scale(self.row_score)
+        self.exact_scores = scale is not None
+        self.score_scale = scale or 1
+        del self._school_author_start, self._row_author, self._row_area, self._row_venue, self._row_year
+        del self._row_score, self._row_papers
+        self._build_year_prefix_sums()
+
+    def _build_year_prefix_sums(self):
+        n_rows = len(self.row_year)
+        cell_keys = (self.row_author.astype(np.int64) * len(self.area_names) + self.row_area) * \
+            len(self.venue_names) + self.row_venue
+        cell_starts = group_starts(cell_keys)
+
+        self.cell_row_start = np.append(cell_starts, n_rows)
+        self.cell_author = self.row_author[cell_starts]
+        self.cell_area = self.row_area[cell_starts]
+        self.cell_venue = self.row_venue[cell_starts]
+
+        prefix_sums = year_prefix_sums(cell_starts, self.row_year, self.score_units(self.row_score), self.row_papers)
+        self.cell_min_year, self.cell_span = prefix_sums.min_year, prefix_sums.span
+        self.cell_offset = prefix_sums.offset
+        self.cum_score, self.cum_papers = prefix_sums.score, prefix_sums.papers
+        self.cum_leaves = prefix_sums.leaves.astype(np.int16)
+
+    @staticmethod
+    def _name_mask(names: Iterable, ids: dict, size: int) -> np.ndarray:
+        mask = np.zeros(size, dtype=bool)
+        for name in names:
+            name_id = ids.get(name)
+            if name_id is not None:
+                mask[name_id] = True
+        return mask
+
+    def score_units(self, scores: np.ndarray) -> np.ndarray:
+        """Converts scores to integer score units, or keeps them as floats when exact_scores is False."""
+        if not self.exact_scores:
+            return scores.astype(np.float64)
+        return np.rint(scores * self.score_scale).astype(np.int64)
+
+    def round_units(self, sums: np.ndarray) -> np.ndarray:
+        """Turns sums of score units, added up as doubles, back into integers when the units are integers."""
+        if not self.exact_scores:
+            return sums
+        return np.rint(sums).astype(np.int64)
+
+    def query_masks(self, needed_conferences, needed_areas) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the boolean masks, by venue id and by area id, of the venues and areas a query keeps."""
+        return (self._name_mask(needed_conferences, self.venue_ids, len(self.venue_names)),
+                self._name_mask(needed_areas, self.area_ids, len(self.area_names)))
+
+    def school_cells(self, school_ids: Iterable[int]) -> np.ndarray:
+        """Returns the positions of the cells that belong to the authors of the given schools, in index order."""
+        school_ids = np.asarray(sorted(set(school_ids)), dtype=np.int64)
+        author_bounds = np.stack((self.school_author_start[school_ids], self.school_author_start[school_ids + 1]))
+        cell_starts, cell_ends = np.searchsorted(self.cell_author, author_bounds)
+        lengths = cell_ends - cell_starts
+        shift = np.repeat(cell_starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return np.arange(int(lengths.sum()), dtype=np.int64) + shift
+
+    def get_school_id(self, school: str) -> int | None:
+        school_ids = getattr(self, '_school_ids', None)
+        if school_ids is None:
+            school_ids = self._school_ids = {name: school_id for school_id, name in enumerate(self.school_names)}
+        return school_ids.get(school)
+
+    def count_cells(self, needed_conferences, needed_areas) -> int:
+        """Counts the cells inside the requested venues and areas, whatever their years: the size of a query."""
+        venue_mask, area_mask = self.query_masks(needed_conferences, needed_areas)
+        return int(np.count_nonzero(venue_mask[self.cell_venue] & area_mask[self.cell_area]))
+
+    def select_cells(self, needed_conferences, needed_areas, low_year, high_year, candidates: np.ndarray = None):
+        """
+        Finds the cells inside the requested venues and areas that have at least one leaf in the year range.
+
+        :param candidates: Optional cell positions, in index order, to search instead of every cell.
+        :return: The cell positions and, for each of them, the score units, paper count and leaf count within the range.
+        """
+        venue_mask, area_mask = self.query_masks(needed_conferences, needed_areas)
+        if candidates is None:
+            cells = np.flatnonzero(venue_mask[self.cell_venue] & area_mask[self.cell_area])
+        else:
+            cells = candidates[venue_mask[self.cell_venue[candidates]] & area_mask[self.cell_area[candidates]]]
+
+        low, high = year_range_positions(self.cell_min_year[cells], self.cell_span[cells], self.cell_offset[cells],
+                                         low_year, high_year)
+
+        leaves = self.cum_leaves[high] - self.cum_leaves[low]
+        active = leaves > 0
+        cells, low, high = cells[active], low[active], high[active]
+        scores = self.cum_score[high] - self.cum_score[low]
+        papers = self.cum_papers[high] - self.cum_papers[low]
+        return cells, scores, papers, leaves[active]
+
+    def filter_school_data(self, needed_conferences, needed_areas, low_year, high_year, include_breakdown=True,
+                           schools: Iterable[str] = None, school_keys: Sequence[str] = None,
+                           author_keys: Sequence[str] = None, include_top_areas=False) -> Dict:
+        """
+        Same result as DataProcessing.filter_school_data, computed from the index instead of the nested snapshot.
+
+        Author scores and paper counts, school totals and, optionally, top areas all come out of one walk over the
+        selected cells.
+
+        :param needed_conferences: Venue names to keep.
+        :param needed_areas: Area names to keep.
+        :param low_year: First year to keep.
+        :param high_year: Last year to keep.
+        :param include_breakdown: When False, each author area only keeps its area_adjusted_score and
+            area_paper_count, without the per-venue, per-year leaves.
+        :param schools: Raw names of the only schools to return; unknown names are ignored. Defaults to all schools.
+        :param school_keys: The key of each school in the result, e.g. its display name, instead of its raw name.
+            When two schools share a key, the later one replaces the earlier one's data.
+        :param author_keys: The key of each author in the result, like school_keys.
+        :param include_top_areas: Also adds the top_areas of every author, as DataProcessing.filter_author_areas does.
+        :return: The filtered school data keyed by the raw school name or its school_keys entry.
+        """
+        school_keys = self.school_names if school_keys is None else school_keys
+        author_keys = self.author_names if author_keys is None else author_keys
+        if schools is None:
+            school_ids, candidates = range(len(self.school_names)), None
+        else:
+            school_ids = sorted({school_id for school_id in map(self.get_school_id, schools) if school_id is not None})
+            candidates = self.school_cells(school_ids)
+        cells, cell_scores, cell_papers, cell_leaves = self.select_cells(needed_conferences, needed_areas, low_year,
+                                                                         high_year, candidates)
+
+        # cells of one (author, area) pair are contiguous, so a pair starts wherever the key changes
+        pair_keys = self.cell_author[cells].astype(np.int64) * len(self.area_names) + self.cell_area[cells]
+        pair_starts_mask = np.ones(len(cells), dtype=bool)
+        pair_starts_mask[1:] = pair_keys[1:] != pair_keys[:-1]
+        pair_of_cell = np.cumsum(pair_starts_mask) - 1
+        pair_cells = cells[pair_starts_mask]
+        n_pairs = len(pair_cells)
+
+        pair_units = self.round_units(np.bincount(pair_of_cell, weights=cell_scores, minlength=n_pairs))
+        pair_scores = pair_units / self.score_scale
+        pair_papers = np.bincount(pair_of_cell, weights=cell_papers, minlength=n_pairs)
+        pair_papers = np.rint(pair_papers).astype(np.int64).tolist()
+        pair_bounds = np.append(np.flatnonzero(pair_starts_mask), len(cells)).tolist()
+        pair_author = self.cell_author[pair_cells]
+        if include_top_areas:
+            pair_top = data_processor.top_areas_mask(pair_scores, group_starts(pair_author)).tolist()
+        pair_units, pair_scores, pair_author = pair_units.tolist(), pair_scores.tolist(), pair_author.tolist()
+        pair_area = self.cell_area[pair_cells].tolist()
+
+        if include_breakdown:
+            # the in-range rows of every selected cell, cell after cell, so each cell owns cell_leaves[i] of them
+            rows = self._cell_rows(cells)
+            rows = rows[(self.row_year[rows] >= low_year) & (self.row_year[rows] <= high_year)]
+            cell_row_bounds = np.concatenate(([0], np.cumsum(cell_leaves))).tolist()
+            cell_venue = self.cell_venue[cells].tolist()
+            row_year = self.row_year[rows].tolist()
+            row_score = self.row_score[rows].tolist()
+            row_papers = self.row_papers[rows].tolist()
+
+        school_author_start = self.school_author_start.tolist()
+
+        filtered_school_data = {}
+        pair = 0
+        for school_id in school_ids:
+            authors = {}
+            total_area_units, total_paper_counts = {}, {}
+
+            for author_id in range(school_author_start[school_id], school_author_start[school_id + 1]):
+                area_paper_counts, area_scores, top_areas, paper_count = {}, {}, [], 0
+
+                while pair < n_pairs and pair_author[pair] == author_id:
+                    area = self.area_names[pair_area[pair]]
+                    area_dict = {'area_adjusted_score': pair_scores[pair]}
+                    if include_breakdown:
+                        for cell in range(pair_bounds[pair], pair_bounds[pair + 1]):
+                            area_dict[self.venue_names[cell_venue[cell]]] = {
+                                str(row_year[row]): {'score': row_score[row], 'year_paper_count': row_papers[row]}
+                                for row in range(cell_row_bounds[cell], cell_row_bounds[cell + 1])
+                            }
+                    area_dict['area_paper_count'] = pair_papers[pair]
+                    area_paper_counts[area] = area_dict
+                    area_scores[area] = pair_scores[pair]
+                    paper_count += pair_papers[pair]
+                    if include_top_areas and pair_top[pair]:
+                        top_areas.append(area)
+
+                    total_area_units[area] = total_area_units.get(area, 0) + pair_units[pair]
+                    total_paper_counts[area] = total_paper_counts.get(area, 0) + pair_papers[pair]
+                    pair += 1
+
+                author_data = {'area_paper_counts': area_paper_counts}
+                if self.author_dblp_links[author_id] is not None:
+                    author_data['dblp_link'] = self.author_dblp_links[author_id]
+                author_data['paper_count'] = paper_count
+                author_data.update(area_scores)
+                if include_top_areas:
+                    author_data['top_areas'] = top_areas
+                authors[author_keys[author_id]] = author_data
+
+            filtered_school_data[school_keys[school_id]] = {
+                'authors': authors,
+                'author_count': self.school_author_counts[school_id],
+                'area_scores': {area: units / self.score_scale for area, units in total_area_units.items()},
+                'total_score': sum(total_area_units.values()) / self.score_scale if total_area_units else 0,
+                'area_paper_counts': total_paper_counts
+            }
+
+        return filtered_school_data
+
+    def _cell_rows(self, cells: np.ndarray) -> np.ndarray:
+        starts = self.cell_row_start[cells]
+        lengths = self.cell_row_start[cells + 1] - starts
+        shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return np.arange(int(lengths.sum()), dtype=np.int64) + shift
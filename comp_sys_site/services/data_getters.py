@@ -1,47 +1,289 @@
+import logging
 import os
-from comp_sys_site.services.all_conferences import all_areas
-from comp_sys_site.services.file_utils import file_utilities
+import time
+from typing import NamedTuple
+from comp_sys_site.services.all_conferences import conferences
+from comp_sys_site.services.author_distribution import AuthorDistributionStore
+from comp_sys_site.services.file_utils import snapshot_cache
 from comp_sys_site.services.data_processing import data_processor
 from comp_sys_site.services.area_conference_mapping import categorize_venue
+from comp_sys_site.services.columnar_index import ColumnarIndex
+from comp_sys_site.services.result_cache import ranking_cache, ranking_query_cache
+from comp_sys_site.services.ranking import Ranking
+from comp_sys_site.services.date_time_utils import get_current_year
+from comp_sys_site.services.http_cache import EncodedPayload, encode_payload
+from comp_sys_site.services.serializers import json_serializer
+from comp_sys_site.services.parallel_filter import school_filter
+from comp_sys_site.services.venue_matrices import VenueMatrices
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-def get_required_data(required_conferences, start_year, end_year):
-    current_path = file_utilities.get_current_file_path()
-    school_data = file_utilities.read_dict_from_file(current_path)
 
+class DisplayNames(NamedTuple):
+    schools: list
+    authors: list
+    school_sources: dict
+
+
+def build_display_names(snapshot) -> DisplayNames:
+    """
+    Formats every school and author name of the snapshot once: the display name of each index position, plus the raw
+    name behind each school display name.
+    """
+    index = snapshot.derived('columnar_index', ColumnarIndex.from_snapshot)
+    schools = data_processor.build_display_names(index.school_names, data_processor.format_university_names)
+    authors = data_processor.build_display_names(index.author_names, data_processor.format_author_name)
+    return DisplayNames(schools, authors, dict(zip(schools, index.school_names)))
+
+
+def filter_snapshot_data(required_conferences, start_year, end_year, snapshot, include_breakdown=True,
+                         schools=None, display_names=False, include_top_areas=False) -> dict:
+    """
+    Filters the snapshot with its columnar index. With display_names, schools and authors are keyed by their formatted
+    names straight away, which is what format_university_data would produce without copying the whole result.
+
+    A heavy query over every school of a snapshot loaded from its binary index is sharded across worker processes
+    when ranking_workers is set, see ShardedSchoolFilter.
+    """
     areas_to_rank = set()
 
     for conf in required_conferences:
         category = categorize_venue.categorize_venue(conf)
         areas_to_rank.add(category)
 
-    filtered_school_data = data_processor.filter_school_data(
-        formatted_school_data=school_data,
+    if not snapshot:
+        return {}
+    index = snapshot.derived('columnar_index', ColumnarIndex.from_snapshot)
+
+    if schools is None and snapshot.binary_path and school_filter.should_shard(index, required_conferences,
+                                                                               areas_to_rank):
+        try:
+            return school_filter.filter_school_data(
+                index, snapshot.binary_path, snapshot.path, display_names,
+                needed_conferences=required_conferences,
+                needed_areas=areas_to_rank,
+                low_year=start_year,
+                high_year=end_year,
+                include_breakdown=include_breakdown,
+                include_top_areas=include_top_areas
+            )
+        except Exception as e:
+            logger.error(f"Sharded filtering failed, filtering in process instead: {str(e)}")
+
+    names = snapshot.derived('display_names', build_display_names) if display_names else None
+    return index.filter_school_data(
         needed_conferences=required_conferences,
         needed_areas=areas_to_rank,
         low_year=start_year,
-        high_year=end_year
+        high_year=end_year,
+        include_breakdown=include_breakdown,
+        schools=schools,
+        school_keys=names.schools if names else None,
+        author_keys=names.authors if names else None,
+        include_top_areas=include_top_areas
     )
-    filtered_school_data = data_processor.format_university_data(filtered_school_data)
-    sorted_school_ranks = data_processor.sort_institutions_by_average_count(filtered_school_data)
-    data_processor.sort_authors_by_total_score(sorted_school_ranks)
 
-    return sorted_school_ranks
+
+def get_ranking(required_conferences, start_year, end_year, snapshot=None) -> Ranking:
+    """
+    Returns the Ranking for the canonical form of a query, computing it only when it is not cached for the snapshot.
+
+    The schools are ranked from the snapshot's venue matrices. A school's authors are filtered the first time it is
+    expanded, with their area scores and paper counts but not the per-venue, per-year breakdown, which is computed
+    for one institution at a time by get_institution_breakdown.
+    """
+    if snapshot is None:
+        snapshot = snapshot_cache.get()
+    version = snapshot.identity if snapshot else None
+    key = ranking_query_cache.make_key(required_conferences, start_year, end_year)
+
+    def compute():
+        if not snapshot:
+            return Ranking({})
+        conferences, low_year, high_year = key
+        areas_to_rank = {categorize_venue.categorize_venue(conf) for conf in conferences}
+        names = snapshot.derived('display_names', build_display_names)
+        matrices = snapshot.derived('venue_matrices', VenueMatrices.from_snapshot)
+        school_totals = matrices.filter_school_totals(conferences, areas_to_rank, low_year, high_year, names.schools)
+
+        def load_authors(institution):
+            school_data = filter_snapshot_data(list(conferences), low_year, high_year, snapshot,
+                                               include_breakdown=False, schools=[names.school_sources[institution]],
+                                               display_names=True)
+            return school_data[institution]['authors']
+
+        return Ranking(data_processor.add_average_counts(school_totals), names.school_sources, load_authors)
+
+    return ranking_query_cache.get_or_compute(version, key, compute)
+
+
+def get_ranking_page(ranking: Ranking, offset: int, limit: int) -> dict:
+    return {
+        'sorted_ranks': ranking.page(offset, limit),
+        'total': len(ranking),
+        'offset': offset,
+        'limit': limit
+    }
+
+
+def get_current_snapshot():
+    return snapshot_cache.get()
+
+
+def get_ranking_page_payload(required_conferences, start_year, end_year, offset, limit,
+                             snapshot=None) -> EncodedPayload:
+    """Returns the encoded page offset .. offset + limit of a ranking query, cached per snapshot."""
+    if snapshot is None:
+        snapshot = snapshot_cache.get()
+    version = snapshot.identity if snapshot else None
+    key = ranking_cache.make_key(required_conferences, start_year, end_year) + ('page', offset, limit)
+
+    def compute():
+        ranking = get_ranking(required_conferences, start_year, end_year, snapshot)
+        return encode_payload(json_serializer.dumps(get_ranking_page(ranking, offset, limit)))
+
+    return ranking_cache.get_or_compute(version, key, compute)
+
+
+def get_institution_authors_payload(required_conferences, start_year, end_year, institution,
+                                    snapshot=None) -> EncodedPayload:
+    """Returns the encoded, sorted authors of one institution for a ranking query, cached per snapshot."""
+    if snapshot is None:
+        snapshot = snapshot_cache.get()
+    version = snapshot.identity if snapshot else None
+    key = ranking_cache.make_key(required_conferences, start_year, end_year) + ('authors', institution)
+
+    def compute():
+        ranking = get_ranking(required_conferences, start_year, end_year, snapshot)
+        authors = ranking.authors(institution)
+        if authors is not None:
+            # the per-area breakdown is served separately by get_institution_breakdown_payload
+            authors = {author: {key: value for key, value in author_data.items() if key != 'area_paper_counts'}
+                       for author, author_data in authors.items()}
+        return encode_payload(json_serializer.dumps({'authors': authors}))
+
+    return ranking_cache.get_or_compute(version, key, compute)
+
+
+def get_institution_breakdown(required_conferences, start_year, end_year, institution, snapshot=None):
+    """
+    Returns the area_paper_counts tree, with per-venue, per-year leaves, of every author of one institution for a
+    ranking query, in the same author order as the ranking. Returns None for an unknown institution.
+    """
+    if snapshot is None:
+        snapshot = snapshot_cache.get()
+    ranking = get_ranking(required_conferences, start_year, end_year, snapshot)
+    authors = ranking.authors(institution)
+    if authors is None:
+        return None
+
+    school = ranking.source_names[institution]
+    conferences, low_year, high_year = ranking_query_cache.make_key(required_conferences, start_year, end_year)
+    school_data = filter_snapshot_data(list(conferences), low_year, high_year, snapshot, schools=[school],
+                                       display_names=True)
+    breakdown = school_data[institution]['authors']
+    return {author: breakdown[author]['area_paper_counts'] for author in authors}
+
+
+def get_institution_breakdown_payload(required_conferences, start_year, end_year, institution,
+                                      snapshot=None) -> EncodedPayload:
+    """Returns the encoded author breakdown of one institution for a ranking query, cached per snapshot."""
+    if snapshot is None:
+        snapshot = snapshot_cache.get()
+    version = snapshot.identity if snapshot else None
+    key = ranking_cache.make_key(required_conferences, start_year, end_year) + ('breakdown', institution)
+
+    def compute():
+        breakdown = get_institution_breakdown(required_conferences, start_year, end_year, institution, snapshot)
+        return encode_payload(json_serializer.dumps({'authors': breakdown}))
+
+    return ranking_cache.get_or_compute(version, key, compute)
+
+
+class DefaultRanking(NamedTuple):
+    ranking: Ranking
+    author_distributions: AuthorDistributionStore
+
+
+def build_default_ranking(snapshot) -> DefaultRanking:
+    """
+    Ranks every conference from 1970 to the current year, for the home page, and keeps the per-author publication
+    distributions served by get_author_pub_distribution_data.
+    """
+    ranking = get_ranking(conferences, 1970, get_current_year(), snapshot)
+    filtered_school_data = filter_snapshot_data(conferences, 1970, get_current_year(), snapshot,
+                                                include_breakdown=False, display_names=True)
+    return DefaultRanking(
+        ranking=ranking,
+        author_distributions=AuthorDistributionStore.from_ranking(filtered_school_data)
+    )
+
+
+def get_default_ranking(snapshot=None) -> DefaultRanking | None:
+    """Returns the default ranking, built once per snapshot (and per calendar year)."""
+    if snapshot is None:
+        snapshot = snapshot_cache.get()
+    if not snapshot:
+        return None
+    return snapshot.derived(f'default_ranking:{get_current_year()}', build_default_ranking)
+
+
+def get_default_ranking_json(limit: int, snapshot=None) -> str:
+    """Returns the JSON of the first page of the default ranking, serialized once per snapshot."""
+    if snapshot is None:
+        snapshot = snapshot_cache.get()
+    if not snapshot:
+        return json_serializer.dumps(get_ranking_page(Ranking({}), 0, limit)).decode('utf-8')
+
+    def build(snapshot) -> str:
+        ranking = get_default_ranking(snapshot).ranking
+        return json_serializer.dumps(get_ranking_page(ranking, 0, limit)).decode('utf-8')
+
+    return snapshot.derived(f'default_ranking_json:{get_current_year()}:{limit}', build)
 
 
 def get_author_pub_distribution_data(institution_name, author):
-    file_path = os.path.join('comp_sys_site', 'static', 'required_files', 'formatted', 'formatted_data.json')
-    data = file_utilities.read_dict_from_file(file_path)
+    default_ranking = get_default_ranking()
+    if default_ranking is None:
+        return None
+    return default_ranking.author_distributions.get(institution_name, author)
+
+
+def warm_up(limit: int) -> bool:
+    """
+    Does the work of the first requests after a start: loads the current snapshot, builds its columnar index, venue
+    matrices and display names, then ranks and serializes the default page of limit rows. Everything is kept on the
+    snapshot, so with Gunicorn's --preload the forked workers inherit it. A stale snapshot is refreshed by the first
+    worker request that finds it, not here.
 
-    if institution_name in data and author in data[institution_name]['authors']:
-        author_data = data[institution_name]['authors'][author]['area_paper_counts']
-        pub_distribution = {area: 0 for area in all_areas}
+    :return: True if a snapshot was warmed up.
+    """
+    start = time.perf_counter()
+    timings = []
 
-        for area, area_data in author_data.items():
-            if area != 'area_adjusted_score' and area != 'area_paper_count':
-                pub_count = area_data.get('area_paper_count', 0)
-                pub_distribution[area] = pub_count
+    def timed(stage, build):
+        stage_start = time.perf_counter()
+        value = build()
+        timings.append(f"{stage} {time.perf_counter() - stage_start:.2f}s")
+        return value
 
-        return pub_distribution
+    # no refresh from here, its thread would stay behind in the master when the server forks
+    snapshot = timed('snapshot', lambda: snapshot_cache.get(refresh=False))
+    if not snapshot:
+        logger.error("No snapshot file available, nothing to warm up.")
+        return False
 
-    return None
+    timed('columnar index', lambda: snapshot.derived('columnar_index', ColumnarIndex.from_snapshot))
+    timed('venue matrices', lambda: snapshot.derived('venue_matrices', VenueMatrices.from_snapshot))
+    timed('display names', lambda: snapshot.derived('display_names', build_display_names))
+    timed('default ranking', lambda: get_default_ranking(snapshot))
+    timed('default ranking json', lambda: get_default_ranking_json(limit, snapshot))
+    timed('default page payload', lambda: get_ranking_page_payload(conferences, 1970, get_current_year(), 0, limit,
+                                                                   snapshot))
+    # the default ranking was the pool's only job, and its processes must not be inherited by forked workers
+    school_filter.shutdown()
+    logger.info(f"Warmed up snapshot {os.path.basename(snapshot.path)} in {time.perf_counter() - start:.2f}s "
+                f"({', '.join(timings)})")
+    return True
@@ -1,13 +1,21 @@
 import math
 import re
+import sys
 from decimal import Decimal
 import heapq
 import logging
+from itertools import chain, compress
+from typing import Iterable
+
+import numpy as np
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# author keys that are not area scores
+non_area_keys = frozenset({'paper_count', 'area_paper_counts', 'dblp_link', 'top_areas'})
+
 
 class DataProcessing:
     def __init__(self):
@@ -38,6 +46,44 @@ class DataProcessing:
         # Combine max value and nearby values (if any) using get_two_highest
         return self.get_two_highest([max_value] + nearby_numbers)
 
+    @staticmethod
+    def top_areas_mask(scores: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """
+        Flags the top areas of many authors at once: each author's highest score and its runner-up within 5%, the
+        values find_max_with_proximity(scores, proximity=5) picks, computed for all authors in one vectorized pass.
+
+        :param scores: The area scores of every author, one contiguous run per author.
+        :param starts: The position of each author's first score; every author has at least one.
+        :return: A boolean mask over scores, True for the top areas.
+        """
+        if not len(scores):
+            return np.zeros(0, dtype=bool)
+        author_of_score = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(scores))))
+        max_scores = np.maximum.reduceat(scores, starts)[author_of_score]
+        nearby = (scores >= max_scores * (1 - 5 / 100)) & (scores < max_scores)
+        runner_ups = np.maximum.reduceat(np.where(nearby, scores, -np.inf), starts)[author_of_score]
+        return (scores == max_scores) | (scores == runner_ups)
+
+    def add_top_areas(self, authors: Iterable[dict]):
+        """Sets the top_areas of every author data dict, in the order of its area scores, in one batch."""
+        authors = list(authors)
+        # flat lists rather than one list per author, which would keep the garbage collector busy on large rankings
+        areas = [key for author_data in authors for key in author_data if key not in non_area_keys]
+        scores = np.fromiter((author_data[key] for author_data in authors for key in author_data
+                              if key not in non_area_keys), dtype=np.float64, count=len(areas))
+        area_counts = np.fromiter((len(author_data) - len(non_area_keys.intersection(author_data))
+                                   for author_data in authors), dtype=np.int64, count=len(authors))
+        starts = np.cumsum(area_counts) - area_counts
+
+        is_top = self.top_areas_mask(scores, starts[area_counts > 0])
+        top_areas = list(compress(areas, is_top.tolist()))
+        top_counts = np.bincount(np.repeat(np.arange(len(authors)), area_counts), weights=is_top,
+                                 minlength=len(authors)).astype(np.int64).tolist()
+        position = 0
+        for author_data, top_count in zip(authors, top_counts):
+            author_data['top_areas'] = top_areas[position:position + top_count]
+            position += top_count
+
     @staticmethod
     def sort_authors(authors_per_school: dict) -> dict:
         return {
@@ -46,9 +92,17 @@ class DataProcessing:
         }
 
     @staticmethod
-    def sort_institutions_by_average_count(institutions_dict):
-        sorted_institutions = sorted(institutions_dict.items(), key=lambda x: x[1]['average_count'], reverse=True)
-        return dict(sorted_institutions)
+    def rank_by_average_count(average_counts) -> np.ndarray:
+        """
+        Returns the positions of average_counts from highest to lowest. Ties keep their original order, like
+        sorted(..., reverse=True).
+        """
+        return np.argsort(-np.asarray(average_counts, dtype=np.float64), kind='stable')
+
+    def sort_institutions_by_average_count(self, institutions_dict):
+        institutions = list(institutions_dict.items())
+        order = self.rank_by_average_count([data['average_count'] for _, data in institutions])
+        return dict(institutions[i] for i in order)
 
     @staticmethod
     def sum_dict_values(data: dict) -> Decimal:
@@ -75,8 +129,10 @@ class DataProcessing:
 
             def calculate_author_score(author_data):
                 _, author_scores = author_data
-                return sum(score for metric, score in author_scores.items()
-                           if metric != 'paper_count' and metric != 'area_paper_counts' and metric != 'dblp_link')
+                # fsum is correctly rounded, so the total does not depend on the order of the areas
+                return math.fsum(score for metric, score in author_scores.items()
+                                 if metric != 'paper_count' and metric != 'area_paper_counts'
+                                 and metric != 'dblp_link' and metric != 'top_areas')
 
             sorted_authors = sorted(authors_dict.items(),
                                     key=calculate_author_score,
@@ -122,6 +178,21 @@ class DataProcessing:
 
         return result
 
+    @staticmethod
+    def format_author_name(author):
+        return re.sub(r'\s*\d+\s*', '', author)
+
+    def build_display_names(self, names, format_name) -> list:
+        """
+        Formats every name once, interning the results so that equal display names share one string.
+
+        :param names: Raw school or author names.
+        :param format_name: format_university_names or format_author_name.
+        :return: The display name of each name, in the same order.
+        """
+        display_names = {name: sys.intern(format_name(name)) for name in set(names)}
+        return [display_names[name] for name in names]
+
     def format_author_names(self, data):
         new_data = {}
         for university, university_data in data.items():
@@ -130,7 +201,7 @@ class DataProcessing:
                 if key == 'authors':
                     new_data[university][key] = {}
                     for author, author_data in value.items():
-                        formatted_author = re.sub(r'\s*\d+\s*', '', author)
+                        formatted_author = self.format_author_name(author)
                         new_data[university][key][formatted_author] = author_data
                 else:
                     new_data[university][key] = value
@@ -153,27 +224,50 @@ class DataProcessing:
         if n == 0:
             return 0
 
-        product = 1
+        # geometric mean of (count + 1), taken in log space so the product cannot overflow
+        log_sum = 0.0
         for i in range(1, n + 1):
-            product *= (adjusted_counts.get(i, 0) + 1)
+            log_sum += math.log1p(adjusted_counts.get(i, 0))
 
-        average_count = math.pow(product, 1 / n)
+        average_count = math.exp(log_sum / n)
         return average_count
 
+    @staticmethod
+    def calculate_average_counts(area_scores_per_school: list[dict]) -> np.ndarray:
+        """
+        Batched calculate_average_count: the geometric mean of (score + 1) over each school's areas, or 0 for a school
+        without areas, computed for all schools at once in log space.
+
+        :param area_scores_per_school: One {area: score} dict per school.
+        :return: The average count of each school, in the same order.
+        """
+        area_counts = np.fromiter((len(area_scores) for area_scores in area_scores_per_school), dtype=np.int64,
+                                  count=len(area_scores_per_school))
+        scores = np.fromiter(chain.from_iterable(area_scores.values() for area_scores in area_scores_per_school),
+                             dtype=np.float64, count=int(area_counts.sum()))
+        school_of_score = np.repeat(np.arange(len(area_counts)), area_counts)
+        log_sums = np.bincount(school_of_score, weights=np.log1p(scores), minlength=len(area_counts))
+
+        average_counts = np.zeros(len(area_counts), dtype=np.float64)
+        has_areas = area_counts > 0
+        average_counts[has_areas] = np.exp(log_sums[has_areas] / area_counts[has_areas])
+        return average_counts
+
+    def add_average_counts(self, school_data: dict):
+        """Adds its average count to every school of school_data, in place, computing them all in one batch."""
+        average_counts = self.calculate_average_counts([data['area_scores'] for data in school_data.values()])
+        for data, average_count in zip(school_data.values(), average_counts.tolist()):
+            # calculate_average_count returns the integer 0 for a school without areas
+            data['average_count'] = average_count if data['area_scores'] else 0
+        return school_data
+
     def format_university_data(self, school_data: dict):
         formatted_school_data = {}
 
+        self.add_average_counts(school_data)
+
         for school, data in school_data.items():
             formatted_name = self.format_university_names(school)
-
-            # Calculate the school's average count using this formula
-            n = len(data['area_scores'])
-            adjusted_counts = {i: count for i, count in enumerate(data['area_scores'].values(), start=1)}
-            average_count = self.calculate_average_count(n, adjusted_counts)
-
-            # Add the average count to the formatted data
-            data['average_count'] = average_count
-
             formatted_school_data[formatted_name] = data
 
         formatted_school_data = self.format_author_names(formatted_school_data)
@@ -336,19 +430,8 @@ class DataProcessing:
         return filtered_school_data
 
     def filter_author_areas(self, school_data):
-        for uni, uni_data in school_data.items():
-            for author, author_data in uni_data['authors'].items():
-                this_author_scores = []
-                for pub_area, pub_area_score in author_data.items():
-                    if pub_area != 'paper_count' and pub_area != 'area_paper_counts' and pub_area != 'dblp_link':
-                        this_author_scores.append(pub_area_score)
-                author_top_scores = self.find_max_with_proximity(this_author_scores, proximity=5)
-                top_areas = []
-                for pub_area, pub_area_score in author_data.items():
-                    if pub_area != 'paper_count' and pub_area != 'area_paper_counts':
-                        if pub_area_score in author_top_scores:
-                            top_areas.append(pub_area)
-                author_data['top_areas'] = top_areas
+        self.add_top_areas(author_data for uni_data in school_data.values()
+                           for author_data in uni_data['authors'].values())
 
 
 data_processor = DataProcessing()
@@ -3,12 +3,18 @@ import shutil
 import time
 import logging
 import json
+import hashlib
+import threading
+import tracemalloc
 from datetime import datetime, timedelta
 import re
-from typing import Dict
+from typing import Callable, Dict, Iterator, Mapping, Tuple
 
 import boto3
 
+from comp_sys_site.services.columnar_index import ColumnarIndex
+from comp_sys_site.services.records import SchoolRecords
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,14 +35,9 @@ class FileUtils:
             raise FileNotFoundError(f"Backup directory not found: {backup_dir}") from e
 
     def read_dict_from_file(self, file_path: str) -> Dict:
-        max_count = 3
         backup_dir = os.path.join('comp_sys_site', 'static', 'required_files', 'backup')
         try:
-            sleep_time, count = 1, 0
-            while not os.path.exists(file_path) and count < max_count:
-                time.sleep(sleep_time)
-                sleep_time *= 2  # Increase sleep time exponentially (1, 2, 4 seconds)
-                count += 1
+            # new snapshots are renamed into place atomically, so a missing file will not appear later
             if os.path.exists(file_path):
                 with open(file_path, 'r', encoding='utf-8') as file:
                     data = json.load(file)
@@ -53,6 +54,80 @@ class FileUtils:
             logger.error(f"Error reading file: {str(e)}")
             return {}
 
+    @staticmethod
+    def iter_json_object_items(file_path: str, chunk_size: int = 1 << 20) -> Iterator[Tuple[str, object]]:
+        """
+        Yields the (key, value) pairs of the top-level JSON object in file_path one at a time.
+
+        Only the current value and the unparsed part of the file buffer are held in memory, so peak memory is bounded
+        by the largest single value instead of the whole document.
+
+        :param file_path: Path of a file holding one JSON object.
+        :param chunk_size: Number of characters read from the file at a time.
+        """
+        decoder = json.JSONDecoder()
+        whitespace = re.compile(r'\s*')
+
+        with open(file_path, 'r', encoding='utf-8') as file:
+            buffer, pos, eof = '', 0, False
+
+            def fill(min_size: int) -> bool:
+                nonlocal buffer, pos, eof
+                if eof:
+                    return False
+                chunk = file.read(max(chunk_size, min_size))
+                if not chunk:
+                    eof = True
+                    return False
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                return True
+
+            def skip_whitespace():
+                nonlocal pos
+                while True:
+                    pos = whitespace.match(buffer, pos).end()
+                    if pos < len(buffer) or not fill(0):
+                        return
+
+            def decode():
+                # a value cut by the end of the buffer can still decode (e.g. '-1.5' of '-1.5e3'), so it only counts
+                # once a delimiter follows it
+                nonlocal pos
+                while True:
+                    try:
+                        value, end = decoder.raw_decode(buffer, pos)
+                        if eof or buffer[end:end + 1] in (' ', '\t', '\n', '\r', ',', ':', '}'):
+                            pos = end
+                            return value
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    fill(len(buffer) - pos)
+
+            def expect(character: str):
+                nonlocal pos
+                skip_whitespace()
+                if buffer[pos:pos + 1] != character:
+                    raise json.JSONDecodeError(f"Expecting '{character}'", buffer, pos)
+                pos += 1
+
+            expect('{')
+            skip_whitespace()
+            if buffer[pos:pos + 1] == '}':
+                return
+            while True:
+                skip_whitespace()
+                key = decode()
+                expect(':')
+                skip_whitespace()
+                yield key, decode()
+
+                skip_whitespace()
+                if buffer[pos:pos + 1] == '}':
+                    return
+                expect(',')
+
     @staticmethod
     def move_old_file_to_backup_dir(backup_dir: str, current_file: str, current_file_path: str):
         try:
@@ -85,35 +160,53 @@ class FileUtils:
             logging.error(f"Error occurred while moving file to backup: {current_file_path}. Error: {str(e)}")
             return False
 
-    def get_current_file_path(self):
+    @staticmethod
+    def get_snapshot_date(file_name: str) -> datetime | None:
+        """Returns the date in an all-school-scores-final-<Month>-<day>-<year> file name, or None for other names."""
+        match = re.search(r'all-school-scores-final-(\w+)-(\d{1,2})-(\d{4})', file_name)
+        if not match:
+            return None
+        month = match.group(1)
+        day = int(match.group(2))
+        year = int(match.group(3))
+        return datetime.strptime(f"{month} {day} {year}", "%B %d %Y")
+
+    def is_stale_snapshot(self, file_name: str) -> bool:
+        creation_time = self.get_snapshot_date(os.path.basename(file_name))
+        return creation_time is not None and creation_time < datetime.now() - timedelta(days=300)
+
+    def get_current_file_path(self, on_stale: Callable[[], object] | None = None, file_dir: str | None = None):
+        """
+        Returns the path of the current all-school-scores file.
+
+        A file older than 300 days is still returned while there is no newer one. on_stale is called in that case,
+        so the caller can fetch a replacement in the background instead of blocking this request on S3.
+
+        :param file_dir: The directory holding the snapshot files, with their backup directory inside it. Defaults to
+            comp_sys_site/static/required_files.
+        """
         try:
-            file_dir = os.path.join('comp_sys_site', 'static', 'required_files')
-            backup_dir = os.path.join('comp_sys_site', 'static', 'required_files', 'backup')
+            file_dir = file_dir or os.path.join('comp_sys_site', 'static', 'required_files')
+            backup_dir = os.path.join(file_dir, 'backup')
             new_file_name = None
             old_file_name = None
-            creation_time_threshold = datetime.now() - timedelta(days=300)
 
             for file in os.listdir(file_dir):
-                match = re.search(r'all-school-scores-final-(\w+)-(\d{1,2})-(\d{4})', file)
-                if match:
-                    month = match.group(1)
-                    day = int(match.group(2))
-                    year = int(match.group(3))
-                    creation_time = datetime.strptime(f"{month} {day} {year}", "%B %d %Y")
-                    if creation_time < creation_time_threshold:
-                        old_file_name = file
-                        new_path = self.get_from_s3()
-                        if new_path:
-                            new_file_name = new_path
-                            break
-                    else:
-                        new_file_name = file
-                        break
+                if self.get_snapshot_date(file) is None:
+                    continue
+                if self.is_stale_snapshot(file):
+                    old_file_name = file
+                else:
+                    new_file_name = file
+                    break
+
+            if not new_file_name and old_file_name:
+                logging.warning(f"{old_file_name} is older than 300 days, serving it until a new file is fetched.")
+                if on_stale is not None:
+                    on_stale()
+                new_file_name = old_file_name
 
             if new_file_name:
-                if old_file_name:
-                    old_file_path = os.path.join('comp_sys_site', 'static', 'required_files', old_file_name)
-                    self.move_old_file_to_backup_dir(backup_dir, old_file_name, old_file_path)
                 file_path = os.path.join(file_dir, new_file_name)
                 logging.info(f"Current file path: {file_path}")
                 return file_path
@@ -135,13 +228,15 @@ class FileUtils:
             logging.error(f"An error occurred: {str(e)}")
             return None
 
-    def get_from_s3(self):
-        try:
-            s3 = boto3.client('s3')
-            bucket_name = os.getenv('s3-bucket')
-            current_folder = 'current/'
-            backup_folder = 'backup/'
+    @staticmethod
+    def download_from_s3(s3, bucket_name: str, download_dir: str) -> Tuple[str, str] | None:
+        """
+        Downloads the file in the 'current' folder of the bucket into download_dir.
 
+        :return: The S3 key and the local path of the downloaded file, or None if there is not exactly one file.
+        """
+        current_folder = 'current/'
+        try:
             # List objects in the 'current' folder
             current_objects = s3.list_objects_v2(Bucket=bucket_name, Prefix=current_folder)
 
@@ -149,21 +244,11 @@ class FileUtils:
             if 'Contents' in current_objects and len(current_objects['Contents']) == 1:
                 current_file_key = current_objects['Contents'][0]['Key']
                 current_file_name = current_file_key.replace(current_folder, '')
+                local_file_path = os.path.join(download_dir, current_file_name)
 
-                local_file_path = os.path.join('comp_sys_site', 'static', 'required_files', current_file_name)
-
-                # Download the current file from S3
                 s3.download_file(bucket_name, current_file_key, local_file_path)
                 logging.info(f"File downloaded from S3: {local_file_path}")
-
-                # Move the current file to the 'backup' folder in S3
-                backup_file_key = backup_folder + current_file_name
-                s3.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': current_file_key},
-                               Key=backup_file_key)
-                s3.delete_object(Bucket=bucket_name, Key=current_file_key)
-                logging.info(f"File moved to backup in S3: {backup_file_key}")
-
-                return str(local_file_path)
+                return current_file_key, local_file_path
             else:
                 logging.error("No file or multiple files found in the 'current' folder in S3.")
                 return None
@@ -172,18 +257,375 @@ class FileUtils:
             return None
 
     @staticmethod
-    def write_formatted_json(data_dict: Dict):
+    def archive_s3_file(s3, bucket_name: str, current_file_key: str) -> bool:
+        """Moves a file from the 'current' folder of the bucket to its 'backup' folder."""
+        try:
+            backup_file_key = 'backup/' + current_file_key.replace('current/', '')
+            s3.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': current_file_key},
+                           Key=backup_file_key)
+            s3.delete_object(Bucket=bucket_name, Key=current_file_key)
+            logging.info(f"File moved to backup in S3: {backup_file_key}")
+            return True
+        except Exception as e:
+            logging.error(f"Error moving file to backup in S3: {str(e)}")
+            return False
+
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+        """Returns the SHA-1 hex digest of the file's bytes."""
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as file:
+            while chunk := file.read(chunk_size):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_binary_index_path(file_path: str, binary_dir: str | None = None) -> str:
+        """Returns the directory holding the binary (memory-mapped) index of the snapshot at file_path."""
+        if binary_dir is None:
+            binary_dir = os.path.join('comp_sys_site', 'static', 'required_files', 'binary')
+        return os.path.join(binary_dir, os.path.basename(file_path))
+
+
+file_utilities = FileUtils()
+
+
+class Snapshot:
+    """
+    A parsed all-school-scores file plus the file identity (path, mtime, inode, size) it was read from.
+
+    The identity is local to this host and keys the in-process caches. The version, which public URLs carry, is a
+    hash of the file's content, so every instance serving the same snapshot agrees on it and a republished file with
+    different content gets a new one even if its name and size are unchanged.
+
+    Anything expensive that is derived from the data should be attached with ``derived`` so it is computed once per
+    snapshot and dropped together with it when a new file is loaded.
+    """
+
+    def __init__(self, path: str, data: Mapping | None, stat_result: os.stat_result):
+        self.path = path
+        # the nested school dicts, or the SchoolRecords view over the columnar index that SnapshotCache loads
+        self.data = data
+        # the memory-mapped binary index the data was loaded from, if any
+        self.binary_path = None
+        self.load_stats = {}
+        self.mtime_ns = stat_result.st_mtime_ns
+        self.inode = stat_result.st_ino
+        self.size = stat_result.st_size
+        self.loaded_at = time.time()
+        identity = f"{os.path.basename(path)}:{self.mtime_ns}:{self.inode}:{self.size}"
+        self.identity = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+        self.version = FileUtils.hash_file(path)[:16]
+        self._derived = {}
+        self._derived_locks = {}
+        self._derived_lock = threading.Lock()
+
+    def matches(self, stat_result: os.stat_result) -> bool:
+        return (stat_result.st_mtime_ns, stat_result.st_ino, stat_result.st_size) == \
+            (self.mtime_ns, self.inode, self.size)
+
+    def attach(self, name: str, value):
+        """Stores an already built derived value under name."""
+        with self._derived_lock:
+            self._derived[name] = value
+
+    def derived(self, name: str, builder: Callable[['Snapshot'], object]):
         """
-        Writes the contents of a dictionary to a file in JSON format, overwriting any existing content.
+        Returns the value stored under name, building it with builder(snapshot) on first use.
 
+        :param name: The cache key for the derived value.
+        :param builder: Called with this snapshot when the value does not exist yet.
+        :return: The derived value.
         """
         try:
-            file_path = os.path.join('comp_sys_site', 'static', 'required_files', 'formatted', 'formatted_data.json')
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(data_dict, file, indent=4)
-            logger.info(f"Successfully wrote data to file: {file_path}")
-        except IOError as e:
-            logger.error(f"An error occurred while writing to the file: {str(e)}")
+            return self._derived[name]
+        except KeyError:
+            pass
+        # one lock per name, so a builder can itself use other derived values of this snapshot
+        with self._derived_lock:
+            name_lock = self._derived_locks.setdefault(name, threading.Lock())
+        with name_lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
 
 
-file_utilities = FileUtils()
+class SnapshotRefresher:
+    """
+    Fetches a new snapshot from S3 on a background thread.
+
+    The file is downloaded into an 'incoming' directory and validated by building its columnar index. It is then
+    renamed into required_files with os.replace, which is atomic on the same filesystem, and its binary index is
+    written. The previous file keeps being served until then, and also when any step fails. SnapshotCache picks
+    the new file up on its next lookup because the directory changed.
+    """
+
+    def __init__(self, file_utils: FileUtils, s3_client_factory: Callable[[], object] | None = None,
+                 bucket_name: str | None = None, file_dir: str | None = None, backup_dir: str | None = None,
+                 min_interval_seconds: float = 900):
+        self.file_utils = file_utils
+        self.s3_client_factory = s3_client_factory or (lambda: boto3.client('s3'))
+        self.bucket_name = bucket_name or os.getenv('s3-bucket')
+        self.file_dir = file_dir or os.path.join('comp_sys_site', 'static', 'required_files')
+        self.backup_dir = backup_dir or os.path.join(self.file_dir, 'backup')
+        self.min_interval_seconds = min_interval_seconds
+        self._thread = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        self.last_refreshed_path = None
+
+    def request_refresh(self) -> bool:
+        """
+        Starts a background refresh unless one is running or the last attempt was less than min_interval_seconds ago.
+
+        :return: True if a refresh was started.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            now = time.monotonic()
+            if self._last_attempt is not None and now - self._last_attempt < self.min_interval_seconds:
+                return False
+            self._last_attempt = now
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout: float | None = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Snapshot refresh failed: {str(e)}")
+
+    @staticmethod
+    def _checked_items(path: str):
+        for school, data in FileUtils.iter_json_object_items(path):
+            if not isinstance(data, dict) or not isinstance(data.get('authors'), dict):
+                raise ValueError(f"School entry {school!r} has no authors")
+            yield school, data
+
+    def validate(self, path: str) -> ColumnarIndex | None:
+        """Returns the columnar index of the snapshot at path, or None if it is not a usable snapshot."""
+        try:
+            index = ColumnarIndex.from_school_items(self._checked_items(path))
+        except (json.JSONDecodeError, ValueError, OSError) as e:
+            logger.error(f"Downloaded snapshot {path} is invalid: {str(e)}")
+            return None
+        if not index.school_names:
+            logger.error(f"Downloaded snapshot {path} has no schools")
+            return None
+        return index
+
+    def refresh(self) -> str | None:
+        """
+        Runs one refresh on the calling thread.
+
+        :return: The path of the new snapshot, or None if nothing was swapped in.
+        """
+        incoming_dir = os.path.join(self.file_dir, 'incoming')
+        os.makedirs(incoming_dir, exist_ok=True)
+        s3 = self.s3_client_factory()
+
+        downloaded = self.file_utils.download_from_s3(s3, self.bucket_name, incoming_dir)
+        if downloaded is None:
+            return None
+        current_file_key, incoming_path = downloaded
+
+        index = self.validate(incoming_path)
+        if index is None:
+            os.remove(incoming_path)
+            return None
+
+        file_name = os.path.basename(incoming_path)
+        new_path = os.path.join(self.file_dir, file_name)
+        old_files = [file for file in os.listdir(self.file_dir)
+                     if file != file_name and self.file_utils.get_snapshot_date(file) is not None]
+        os.replace(incoming_path, new_path)
+        for old_file in old_files:
+            self.file_utils.move_old_file_to_backup_dir(self.backup_dir, old_file,
+                                                        os.path.join(self.file_dir, old_file))
+        self.file_utils.archive_s3_file(s3, self.bucket_name, current_file_key)
+
+        try:
+            binary_dir = os.path.join(self.file_dir, 'binary')
+            os.makedirs(binary_dir, exist_ok=True)
+            index.save(self.file_utils.get_binary_index_path(new_path, binary_dir), source_path=new_path)
+        except OSError as e:
+            logger.error(f"Unable to write the binary index for {new_path}: {str(e)}")
+
+        self.last_refreshed_path = new_path
+        logger.info(f"Swapped in new snapshot {new_path}")
+        return new_path
+
+
+class SnapshotCache:
+    """
+    Process-wide cache of the current all-school-scores snapshot.
+
+    A lookup only stats the required_files directory and the loaded file. The directory listing, regex scan and JSON
+    parse in FileUtils run again only when one of those stats changes, and the new snapshot replaces the old one in a
+    single assignment, so concurrent readers always see a complete snapshot.
+    """
+
+    load_modes = ('json', 'streaming')
+
+    def __init__(self, file_utils: FileUtils, refresher: SnapshotRefresher | None = None, load_mode: str = 'json',
+                 trace_memory: bool = False, file_dir: str | None = None):
+        self.file_utils = file_utils
+        self.refresher = refresher
+        self.file_dir = file_dir or os.path.join('comp_sys_site', 'static', 'required_files')
+        if load_mode not in self.load_modes:
+            logger.error(f"Unknown snapshot load mode '{load_mode}', using 'json'")
+            load_mode = 'json'
+        self.load_mode = load_mode
+        self.trace_memory = trace_memory
+        self._snapshot = None
+        self._dir_mtime_ns = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits, self.misses, self.reloads = 0, 0, 0
+
+    def _dir_mtime(self):
+        try:
+            return os.stat(self.file_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _is_fresh(self, snapshot: Snapshot) -> bool:
+        if snapshot is None or self._dir_mtime() != self._dir_mtime_ns:
+            return False
+        try:
+            return snapshot.matches(os.stat(snapshot.path))
+        except OSError:
+            return False
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, refresh: bool = True) -> Snapshot | None:
+        """
+        Returns the current snapshot, reloading it first if its file or the directory changed.
+
+        :param refresh: Start a background refresh when the snapshot is stale. The warm-up passes False: it runs
+            before the server forks its workers, which would not inherit the refresher's thread.
+        """
+        refresher = self.refresher if refresh else None
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            self._count('hits')
+            if refresher is not None and self.file_utils.is_stale_snapshot(snapshot.path):
+                refresher.request_refresh()
+            return snapshot
+
+        with self._lock:
+            # another thread may have reloaded while we waited for the lock
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                self._count('hits')
+                return snapshot
+
+            self._count('misses')
+            dir_mtime_ns = self._dir_mtime()
+            path = self.file_utils.get_current_file_path(
+                on_stale=refresher.request_refresh if refresher is not None else None, file_dir=self.file_dir)
+            if path is None:
+                logger.error("No snapshot file available, serving the previously loaded snapshot.")
+                return snapshot
+
+            try:
+                stat_result = os.stat(path)
+            except OSError as e:
+                logger.error(f"Unable to stat snapshot file {path}: {str(e)}")
+                return snapshot
+
+            if snapshot is not None and snapshot.path == path and snapshot.matches(stat_result):
+                self._dir_mtime_ns = dir_mtime_ns
+                return snapshot
+
+            new_snapshot = self.load_snapshot(path, stat_result, self.load_mode, self.trace_memory)
+            if new_snapshot is None and snapshot is not None:
+                logger.error(f"Snapshot file {path} could not be read, keeping {snapshot.path}.")
+                return snapshot
+
+            self._dir_mtime_ns = dir_mtime_ns
+            self._snapshot = new_snapshot
+            self._count('reloads')
+            return new_snapshot
+
+    def load_snapshot(self, path: str, stat_result: os.stat_result, load_mode: str = 'json',
+                      trace_memory: bool = False) -> Snapshot | None:
+        """
+        Reads a snapshot file and records how long the parse took (and its peak traced memory, if requested) in
+        Snapshot.load_stats.
+
+        If the convert_snapshot command wrote a binary index for this exact file, it is memory-mapped instead.
+        Otherwise 'json' parses the whole file with json.load and flattens it into the columnar index, and 'streaming'
+        parses one school at a time and flattens each into the index right away, so the nested dict tree never exists
+        in full. Either way only the index is kept: Snapshot.data is a SchoolRecords view over it, which rebuilds the
+        dicts of a school on demand.
+        """
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            binary_path = self.file_utils.get_binary_index_path(path, os.path.join(self.file_dir, 'binary'))
+            index = ColumnarIndex.load(binary_path, source_path=path) if os.path.isdir(binary_path) else None
+            if index is not None:
+                load_mode = 'binary'
+            elif load_mode == 'streaming':
+                index = ColumnarIndex.from_school_items(self.file_utils.iter_json_object_items(path))
+            else:
+                index = ColumnarIndex.from_school_data(self.file_utils.read_dict_from_file(path))
+
+            snapshot = None
+            if index.school_names:
+                snapshot = Snapshot(path, SchoolRecords(index), stat_result)
+                snapshot.attach('columnar_index', index)
+                if load_mode == 'binary':
+                    snapshot.binary_path = binary_path
+        except (json.JSONDecodeError, IOError, ValueError) as e:
+            logger.error(f"Error loading snapshot {path}: {str(e)}")
+            snapshot = None
+        finally:
+            parse_seconds = time.perf_counter() - start
+            peak_bytes = None
+            if trace_memory:
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+        if snapshot is None:
+            return None
+        snapshot.load_stats = {'mode': load_mode, 'parse_seconds': parse_seconds, 'peak_bytes': peak_bytes}
+        peak = f", peak {peak_bytes / 2 ** 20:.1f} MiB" if peak_bytes is not None else ""
+        logger.info(f"Loaded snapshot {path} (version {snapshot.version}) in {parse_seconds:.2f}s "
+                    f"using {load_mode} mode{peak}")
+        return snapshot
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            snapshot = self._snapshot
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'path': snapshot.path if snapshot else None,
+                'version': snapshot.version if snapshot else None,
+                'load_stats': snapshot.load_stats if snapshot else None,
+            }
+
+
+snapshot_refresher = SnapshotRefresher(file_utilities)
+snapshot_cache = SnapshotCache(
+    file_utilities,
+    refresher=snapshot_refresher,
+    load_mode=os.getenv('snapshot_load_mode', 'json'),
+    trace_memory=os.getenv('snapshot_trace_memory', '').lower() in ('1', 'true', 'yes')
+)
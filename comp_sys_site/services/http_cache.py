@@ -0,0 +1,96 @@
+import gzip
+import hashlib
+import logging
+from typing import NamedTuple
+
+import brotli
+from django.http import HttpResponse, HttpResponseNotModified
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# bodies smaller than this are sent as they are, compressing them costs more than it saves
+MIN_COMPRESS_SIZE = 1024
+
+# responses may be stored, but must be revalidated with If-None-Match before each reuse
+REVALIDATE = 'no-cache'
+
+
+class EncodedPayload(NamedTuple):
+    """
+    A response body stored with its compressed variants and its ETag, so a cached response is never compressed or
+    hashed again. gzip and br are None when the body is too small to compress.
+    """
+    body: bytes
+    etag: str
+    gzip: bytes | None
+    br: bytes | None
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + len(self.gzip or b'') + len(self.br or b'')
+
+
+def encode_payload(body: bytes) -> EncodedPayload:
+    """
+    Compresses a response body once, with gzip and with brotli.
+
+    The ETag is weak because the same tag is sent for every encoding of the body.
+    """
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+    if len(body) < MIN_COMPRESS_SIZE:
+        return EncodedPayload(body, etag, None, None)
+
+    gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+    return EncodedPayload(body, etag, gzipped, brotli.compress(body, quality=5))
+
+
+def accepted_encodings(request) -> set:
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        name, _, quality = params.partition('=')
+        try:
+            refused = name.strip() == 'q' and float(quality) == 0
+        except ValueError:
+            refused = False
+        if coding.strip() and not refused:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(request, etag: str) -> bool:
+    """Weak comparison of the request's If-None-Match header with etag, as required for conditional GETs."""
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque_tag = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque_tag for tag in if_none_match.split(','))
+
+
+def payload_response(request, payload: EncodedPayload, content_type: str = 'application/json',
+                     cache_control: str = REVALIDATE) -> HttpResponse:
+    """
+    Answers a request with a pre-encoded payload: 304 when the client already has it, otherwise the smallest encoding
+    the client accepts.
+    """
+    if etag_matches(request, payload.etag):
+        response = HttpResponseNotModified()
+    else:
+        accepted = accepted_encodings(request)
+        if payload.br is not None and 'br' in accepted:
+            response = HttpResponse(payload.br, content_type=content_type)
+            response['Content-Encoding'] = 'br'
+        elif payload.gzip is not None and 'gzip' in accepted:
+            response = HttpResponse(payload.gzip, content_type=content_type)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(payload.body, content_type=content_type)
+
+    response['ETag'] = payload.etag
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
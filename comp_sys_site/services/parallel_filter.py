@@ -0,0 +1,123 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Sequence
+
+import numpy as np
+
+from comp_sys_site.services.columnar_index import ColumnarIndex
+from comp_sys_site.services.data_processing import data_processor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# set in every worker process by _attach_worker
+_worker_index = None
+_worker_display_names = None
+
+
+def _attach_worker(binary_path: str, source_path: str):
+    """Memory-maps the snapshot's binary index once per worker, so the workers share its pages with each other."""
+    global _worker_index, _worker_display_names
+    _worker_index = ColumnarIndex.load(binary_path, source_path)
+    if _worker_index is None:
+        raise RuntimeError(f"Binary index {binary_path} does not match {source_path}")
+    _worker_display_names = (
+        data_processor.build_display_names(_worker_index.school_names, data_processor.format_university_names),
+        data_processor.build_display_names(_worker_index.author_names, data_processor.format_author_name)
+    )
+
+
+def _filter_shard(first_school: int, last_school: int, query: Dict, display_names: bool) -> Dict:
+    school_keys, author_keys = _worker_display_names if display_names else (None, None)
+    return _worker_index.filter_school_data(schools=_worker_index.school_names[first_school:last_school],
+                                            school_keys=school_keys, author_keys=author_keys, **query)
+
+
+class ShardedSchoolFilter:
+    """
+    Runs ColumnarIndex.filter_school_data for heavy queries on a process pool, one contiguous range of schools per
+    task, and merges the shards back in school order so the result is the same as the in-process one.
+
+    Workers attach to the snapshot through its memory-mapped binary index, so a snapshot without one is always filtered
+    in process. Queries selecting fewer than min_cells cells stay in process too: for them, starting the tasks and
+    pickling the results back costs more than the filtering.
+
+    Rankings are served from VenueMatrices, so the only query filtering every school is the cold build of the default
+    ranking's author distributions, every conference from 1970 on, which is what this is for.
+    """
+
+    def __init__(self, workers: int = 0, min_cells: int = 200000, shards_per_worker: int = 2):
+        self.workers = workers
+        self.min_cells = min_cells
+        self.shards_per_worker = shards_per_worker
+        self._pool = None
+        self._pool_source = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    def should_shard(self, index: ColumnarIndex, needed_conferences, needed_areas) -> bool:
+        return self.enabled and index.count_cells(needed_conferences, needed_areas) >= self.min_cells
+
+    def _get_pool(self, binary_path: str, source_path: str) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool_source != (binary_path, source_path):
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                # spawned rather than forked, the web process has threads of its own
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_attach_worker, initargs=(binary_path, source_path))
+                self._pool_source = (binary_path, source_path)
+            return self._pool
+
+    def shard_bounds(self, index: ColumnarIndex) -> Sequence[int]:
+        """Splits the schools into contiguous ranges holding about the same number of cells."""
+        n_schools = len(index.school_names)
+        school_cell_start = np.searchsorted(index.cell_author, index.school_author_start)
+        targets = np.linspace(0, school_cell_start[-1], self.workers * self.shards_per_worker + 1)
+        bounds = np.searchsorted(school_cell_start, targets)
+        bounds[0], bounds[-1] = 0, n_schools
+        return np.unique(bounds).tolist()
+
+    def filter_school_data(self, index: ColumnarIndex, binary_path: str, source_path: str, display_names: bool,
+                           **query) -> Dict:
+        """
+        Filters every school on the pool and returns what index.filter_school_data would.
+
+        :param index: The in-process index of the snapshot, used to split the schools.
+        :param binary_path: The snapshot's binary index directory.
+        :param source_path: The snapshot file the binary index must have been built from.
+        :param display_names: Key the result by display names, like data_getters.filter_snapshot_data does.
+        :param query: The remaining filter_school_data arguments.
+        """
+        start = time.perf_counter()
+        pool = self._get_pool(os.path.abspath(binary_path), os.path.abspath(source_path))
+        bounds = self.shard_bounds(index)
+        futures = [pool.submit(_filter_shard, first, last, query, display_names)
+                   for first, last in zip(bounds[:-1], bounds[1:])]
+
+        # schools sharing a display name keep the first one's position and the last one's data, as in one pass
+        filtered_school_data = {}
+        for future in futures:
+            filtered_school_data.update(future.result())
+        logger.info(f"Filtered {len(filtered_school_data)} schools in {len(futures)} shards "
+                    f"in {time.perf_counter() - start:.3f}s")
+        return filtered_school_data
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool, self._pool_source = None, None
+
+
+school_filter = ShardedSchoolFilter(workers=int(os.getenv('ranking_workers', '0')),
+                                    min_cells=int(os.getenv('ranking_parallel_min_cells', '200000')))
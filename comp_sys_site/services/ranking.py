@@ -0,0 +1,78 @@
+import threading
+from typing import Callable, Dict
+
+import numpy as np
+
+from comp_sys_site.services.data_processing import data_processor
+
+
+class Ranking:
+    """
+    The result of one ranking query: the formatted school data and the average counts that order it.
+
+    Only the schools of the requested page are selected and sorted, and a school's authors are loaded, sorted and
+    tagged with their top areas the first time that school is expanded.
+
+    :param school_data: The formatted school data, keyed by display name, with or without the authors.
+    :param source_names: The raw snapshot name of each display name, used to look a school up in the index again.
+    :param load_authors: Returns the authors of a school whose data has none, from its display name.
+    """
+
+    def __init__(self, school_data: Dict, source_names: Dict[str, str] = None,
+                 load_authors: Callable[[str], Dict] = None):
+        self.school_data = school_data
+        self.source_names = source_names or {}
+        self.load_authors = load_authors
+        self.institutions = list(school_data)
+        self.average_counts = np.array([data['average_count'] for data in school_data.values()], dtype=np.float64)
+        self._authors = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.institutions)
+
+    def top_positions(self, k: int) -> np.ndarray:
+        """
+        Returns the positions of the k highest average counts, highest first. Equal counts keep their original
+        order, so every page agrees with a full stable sort.
+        """
+        n = len(self.average_counts)
+        if k >= n:
+            return data_processor.rank_by_average_count(self.average_counts)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+
+        negated = -self.average_counts
+        kth = np.partition(negated, k - 1)[k - 1]
+        above = np.flatnonzero(negated < kth)
+        ties = np.flatnonzero(negated == kth)[:k - len(above)]
+        candidates = np.concatenate((above, ties))
+        return candidates[np.lexsort((candidates, negated[candidates]))]
+
+    def page(self, offset: int, limit: int) -> Dict:
+        """Returns the school-level data, without authors, of the schools ranked offset + 1 .. offset + limit."""
+        positions = self.top_positions(offset + limit)[offset:]
+        page = {}
+        for position in positions.tolist():
+            institution = self.institutions[position]
+            page[institution] = {key: value for key, value in self.school_data[institution].items()
+                                 if key != 'authors'}
+        return page
+
+    def authors(self, institution: str) -> Dict | None:
+        """Returns the institution's authors sorted by total score with their top areas, or None if it is unknown."""
+        authors = self._authors.get(institution)
+        if authors is not None:
+            return authors
+        data = self.school_data.get(institution)
+        if data is None:
+            return None
+
+        with self._lock:
+            if institution not in self._authors:
+                authors = data['authors'] if 'authors' in data else self.load_authors(institution)
+                school = {institution: {'authors': authors}}
+                data_processor.sort_authors_by_total_score(school)
+                data_processor.add_top_areas(school[institution]['authors'].values())
+                self._authors[institution] = school[institution]['authors']
+            return self._authors[institution]
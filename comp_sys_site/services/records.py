@@ -0,0 +1,112 @@
+from collections.abc import Mapping
+from typing import Dict, Iterator
+
+import numpy as np
+
+from comp_sys_site.services.columnar_index import ColumnarIndex
+
+
+class Author:
+    """
+    One author of a snapshot, read from the arrays of its ColumnarIndex: interned area and venue ids, int years and
+    per-year scores and paper counts, with no dict of its own until to_dict() projects it.
+    """
+    __slots__ = ('index', 'author_id')
+
+    def __init__(self, index: ColumnarIndex, author_id: int):
+        self.index = index
+        self.author_id = author_id
+
+    @property
+    def name(self) -> str:
+        return self.index.author_names[self.author_id]
+
+    @property
+    def dblp_link(self) -> str | None:
+        return self.index.author_dblp_links[self.author_id]
+
+    @property
+    def rows(self) -> slice:
+        """The author's leaves, which are contiguous in the index."""
+        first, last = np.searchsorted(self.index.row_author, (self.author_id, self.author_id + 1))
+        return slice(int(first), int(last))
+
+    @property
+    def paper_count(self) -> int:
+        return int(self.index.row_papers[self.rows].sum())
+
+    def to_dict(self) -> Dict:
+        """
+        Projects the author back to its snapshot dict: area_paper_counts -> area -> venue -> year -> score and
+        year_paper_count. The paper_count is recomputed from the leaves.
+        """
+        index, rows = self.index, self.rows
+        area_paper_counts, paper_count = {}, 0
+        for area_id, venue_id, year, score, papers in zip(index.row_area[rows].tolist(), index.row_venue[rows].tolist(),
+                                                          index.row_year[rows].tolist(),
+                                                          index.row_score[rows].tolist(),
+                                                          index.row_papers[rows].tolist()):
+            venue_data = area_paper_counts.setdefault(index.area_names[area_id], {}).setdefault(
+                index.venue_names[venue_id], {})
+            venue_data[str(year)] = {'score': score, 'year_paper_count': papers}
+            paper_count += papers
+
+        author_data = {'paper_count': paper_count}
+        if self.dblp_link is not None:
+            author_data['dblp_link'] = self.dblp_link
+        author_data['area_paper_counts'] = area_paper_counts
+        return author_data
+
+
+class School:
+    """One school of a snapshot, read from its ColumnarIndex like Author."""
+    __slots__ = ('index', 'school_id')
+
+    def __init__(self, index: ColumnarIndex, school_id: int):
+        self.index = index
+        self.school_id = school_id
+
+    @property
+    def name(self) -> str:
+        return self.index.school_names[self.school_id]
+
+    @property
+    def author_count(self) -> int:
+        return self.index.school_author_counts[self.school_id]
+
+    @property
+    def authors(self) -> Iterator[Author]:
+        first, last = self.index.school_author_start[self.school_id:self.school_id + 2].tolist()
+        return (Author(self.index, author_id) for author_id in range(first, last))
+
+    def to_dict(self) -> Dict:
+        """Projects the school back to its snapshot dict."""
+        return {'author_count': self.author_count,
+                'authors': {author.name: author.to_dict() for author in self.authors}}
+
+
+class SchoolRecords(Mapping):
+    """
+    Read-only mapping of school name to School over a ColumnarIndex, which stands in for the nested dict tree of a
+    snapshot: the tree is only built, one school at a time, for the code that asks for it with to_dict().
+    """
+
+    def __init__(self, index: ColumnarIndex):
+        self.index = index
+
+    def __getitem__(self, school: str) -> School:
+        school_id = self.index.get_school_id(school)
+        if school_id is None:
+            raise KeyError(school)
+        return School(self.index, school_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index.school_names)
+
+    def __len__(self) -> int:
+        return len(self.index.school_names)
+
+    def to_dict(self) -> Dict:
+        """Projects the whole snapshot back to its nested dict tree."""
+        return {school: School(self.index, school_id).to_dict()
+                for school_id, school in enumerate(self.index.school_names)}
@@ -0,0 +1,83 @@
+import math
+
+from comp_sys_site.services.data_processing import DataProcessing
+
+
+class ReferencePipeline(DataProcessing):
+    """
+    The dict-walking pipeline as it was before the index: the DataProcessing methods that have since been rewritten
+    on top of the same kernels as the index are frozen here in their original form, so they stay an independent
+    oracle for the tests and the verify_rankings command. filter_school_data and find_max_with_proximity are still the
+    original code.
+
+    Do not change these methods to follow DataProcessing: they are what its results are checked against.
+    """
+
+    def calculate_average_count(self, n, adjusted_counts):
+        if n == 0:
+            return 0
+
+        product = 1
+        for i in range(1, n + 1):
+            product *= (adjusted_counts.get(i, 0) + 1)
+
+        average_count = math.pow(product, 1 / n)
+        return average_count
+
+    def format_university_data(self, school_data: dict):
+        formatted_school_data = {}
+
+        for school, data in school_data.items():
+            formatted_name = self.format_university_names(school)
+
+            # Calculate the school's average count using this formula
+            n = len(data['area_scores'])
+            adjusted_counts = {i: count for i, count in enumerate(data['area_scores'].values(), start=1)}
+            average_count = self.calculate_average_count(n, adjusted_counts)
+
+            # Add the average count to the formatted data
+            data['average_count'] = average_count
+
+            formatted_school_data[formatted_name] = data
+
+        formatted_school_data = self.format_author_names(formatted_school_data)
+
+        return formatted_school_data
+
+    @staticmethod
+    def sort_institutions_by_average_count(institutions_dict):
+        sorted_institutions = sorted(institutions_dict.items(), key=lambda x: x[1]['average_count'], reverse=True)
+        return dict(sorted_institutions)
+
+    @staticmethod
+    def sort_authors_by_total_score(institutions_dict):
+        for institution, scores in institutions_dict.items():
+            authors_dict = scores['authors']
+
+            def calculate_author_score(author_data):
+                _, author_scores = author_data
+                return sum(score for metric, score in author_scores.items()
+                           if metric != 'paper_count' and metric != 'area_paper_counts' and metric != 'dblp_link')
+
+            sorted_authors = sorted(authors_dict.items(),
+                                    key=calculate_author_score,
+                                    reverse=True)
+
+            scores['authors'] = dict(sorted_authors)
+
+        return institutions_dict
+
+    def filter_author_areas(self, school_data):
+        for uni, uni_data in school_data.items():
+            for author, author_data in uni_data['authors'].items():
+                this_author_scores = []
+                for pub_area, pub_area_score in author_data.items():
+                    if pub_area != 'paper_count' and pub_area != 'area_paper_counts' and pub_area != 'dblp_link':
+                        this_author_scores.append(pub_area_score)
+                author_top_scores = self.find_max_with_proximity(this_author_scores, proximity=5)
+                top_areas = []
+                for pub_area, pub_area_score in author_data.items():
+                    if pub_area != 'paper_count' and pub_area != 'area_paper_counts':
+                        if pub_area_score in author_top_scores:
+                            top_areas.append(pub_area)
+                author_data['top_areas'] = top_areas
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Bounded LRU cache with a per-entry TTL for computed ranking results.
+
+    Entries belong to one snapshot version: the first lookup made with a different version empties the cache, so a
+    newly loaded data file never serves results computed from the previous one.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits, self.misses, self.evictions, self.expirations, self.invalidations = 0, 0, 0, 0, 0
+
+    @staticmethod
+    def make_key(conferences: Iterable[str], start_year: int, end_year: int) -> tuple:
+        """
+        Builds the canonical key of a ranking query: the de-duplicated, sorted conference names plus the years.
+
+        :param conferences: The selected conference names, in any order.
+        :param start_year: The first year of the range.
+        :param end_year: The last year of the range.
+        :return: A hashable key that is equal for equivalent queries.
+        """
+        normalized = sorted({conf.strip() for conf in conferences if conf and conf.strip()})
+        return tuple(normalized), int(start_year), int(end_year)
+
+    @staticmethod
+    def _size_of(value) -> int:
+        if isinstance(value, (bytes, bytearray, str)):
+            return len(value)
+        return getattr(value, 'nbytes', 0)
+
+    def _remove(self, key: Hashable):
+        _, value = self._entries.pop(key)
+        self._bytes -= self._size_of(value)
+
+    def _check_version(self, version: Hashable):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                logger.info(f"Snapshot version changed to {version}, dropping {len(self._entries)} cached results")
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, version: Hashable, key: Hashable):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, version: Hashable, key: Hashable, value):
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key)
+            size = self._size_of(value)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, version: Hashable, key: Hashable, compute: Callable[[], object]):
+        """
+        Returns the cached value for key, calling compute() and storing its result on a miss.
+
+        compute() runs outside the lock, so two threads missing on the same key may both compute it.
+        """
+        value = self.get(version, key)
+        if value is None:
+            value = compute()
+            self.put(version, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'version': self._version,
+            }
+
+
+# encoded responses
+ranking_cache = ResultCache()
+# computed Ranking objects, shared by the pages and author lists of the same query
+ranking_query_cache = ResultCache(max_entries=16)
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+from decimal import Decimal
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def to_json_value(value):
+    """Converts the values the standard encoders reject, Decimals and NumPy scalars or arrays, to plain JSON values."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JsonSerializer:
+    """
+    Writes response bodies as compact UTF-8 JSON bytes with the standard library encoder.
+
+    Subclasses write the same JSON values, but not always the same bytes: floats may be spelled differently (5e-05
+    here, 0.00005 by orjson), so ETags are only stable for one serializer. NaN and infinities are not valid JSON, this
+    encoder raises ValueError for them where orjson writes null.
+    """
+    name = 'json'
+
+    def dumps(self, data) -> bytes:
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False, allow_nan=False,
+                          default=to_json_value).encode('utf-8')
+
+
+class OrjsonSerializer(JsonSerializer):
+    name = 'orjson'
+
+    def dumps(self, data) -> bytes:
+        return orjson.dumps(data, default=to_json_value, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+serializers = {serializer.name: serializer for serializer in (JsonSerializer, OrjsonSerializer)}
+
+
+def get_serializer(name: str = 'auto') -> JsonSerializer:
+    """
+    Returns the serializer called name, or the fastest installed one for 'auto'.
+
+    :raises ValueError: If name is unknown or its package is not installed.
+    """
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'json'
+    if name not in serializers:
+        raise ValueError(f"Unknown JSON serializer: {name}")
+    if name == 'orjson' and orjson is None:
+        raise ValueError("The orjson serializer needs the orjson package")
+    return serializers[name]()
+
+
+json_serializer = get_serializer(os.getenv('json_serializer', 'auto'))
+logger.info(f"Serializing responses with {json_serializer.name}")
@@ -0,0 +1,102 @@
+import json
+import os
+import random
+from datetime import date
+from typing import Dict
+
+from comp_sys_site.services.all_conferences import conferences
+from comp_sys_site.services.area_conference_mapping import categorize_venue
+from comp_sys_site.services.date_time_utils import get_current_year
+
+FIRST_YEAR = 1970
+# changes whenever the same arguments start generating a different snapshot, so benchmark runs are only compared on
+# identical data
+GENERATOR_VERSION = 2
+
+_SYLLABLES = ['an', 'be', 'chi', 'da', 'el', 'fo', 'gu', 'ha', 'is', 'jo', 'ka', 'li', 'mo', 'na', 'or', 'pe', 'qu',
+              'ra', 'si', 'ta', 'ul', 've', 'wu', 'xi', 'ya', 'zo']
+_SCHOOL_PATTERNS = ['university of {}', '{} university', '{} institute of technology', 'state university of {}',
+                    '{} college', 'university of {} at {}']
+
+
+def _word(rnd: random.Random, syllables: int) -> str:
+    return ''.join(rnd.choice(_SYLLABLES) for _ in range(syllables))
+
+
+def snapshot_file_name(snapshot_date: date) -> str:
+    """Returns the all-school-scores file name FileUtils expects for a snapshot taken on snapshot_date."""
+    return f"all-school-scores-final-{snapshot_date.strftime('%B')}-{snapshot_date.day}-{snapshot_date.year}"
+
+
+def generate_snapshot(schools: int = 100, authors_per_school: int = 30, seed: int = 0,
+                      last_year: int | None = None) -> Dict:
+    """
+    Generates an all-school-scores snapshot with the same schema, and roughly the same shape, as the real one.
+
+    School sizes vary around authors_per_school. Authors publish in one to three areas, mostly one, at the venues of
+    all_conferences.conferences, the names the site queries with, over a career of a few to fifty years between 1970
+    and last_year. Author names carry the numeric suffix that DBLP uses for homonyms.
+
+    :param schools: The number of schools.
+    :param authors_per_school: The mean number of authors of a school.
+    :param seed: Seed of the generator; the same arguments always give the same snapshot.
+    :param last_year: The last publication year, the current year by default.
+    :return: The snapshot dict, keyed by school name.
+    """
+    rnd = random.Random(seed)
+    last_year = last_year or get_current_year()
+    venues = {}
+    for conf in conferences:
+        area = categorize_venue.categorize_venue(conf)
+        if area is not None:
+            venues.setdefault(area, []).append(conf)
+    areas = list(venues)
+
+    snapshot = {}
+    while len(snapshot) < schools:
+        pattern = rnd.choice(_SCHOOL_PATTERNS)
+        school = pattern.format(*(_word(rnd, rnd.randint(2, 4)) for _ in range(pattern.count('{}'))))
+        if school in snapshot:
+            continue
+
+        authors = {}
+        for _ in range(max(1, int(rnd.lognormvariate(0, 0.6) * authors_per_school))):
+            author = f"{_word(rnd, 2).capitalize()} {_word(rnd, 3).capitalize()}"
+            if rnd.random() < 0.1:
+                author += f" {rnd.randint(1, 20):04d}"
+            career_start = rnd.randint(FIRST_YEAR, last_year)
+            career_end = min(last_year, career_start + rnd.randint(3, 50))
+
+            area_paper_counts, paper_count = {}, 0
+            for area in rnd.sample(areas, rnd.choices([1, 2, 3], weights=[6, 3, 1])[0]):
+                area_data = {}
+                for venue in rnd.sample(venues[area], min(len(venues[area]), rnd.randint(1, 3))):
+                    years = rnd.sample(range(career_start, career_end + 1),
+                                       min(career_end - career_start + 1, rnd.randint(1, 12)))
+                    venue_data = {}
+                    for year in sorted(years):
+                        year_paper_count = rnd.choices([1, 2, 3, 4], weights=[8, 3, 1, 1])[0]
+                        # each paper adds 1 / number of authors
+                        score = sum(1 / rnd.randint(1, 8) for _ in range(year_paper_count))
+                        venue_data[str(year)] = {'score': round(score, 4), 'year_paper_count': year_paper_count}
+                        paper_count += year_paper_count
+                    area_data[venue] = venue_data
+                area_paper_counts[area] = area_data
+
+            authors[author] = {
+                'paper_count': paper_count,
+                'dblp_link': f"https://dblp.org/pid/{rnd.randint(1, 300)}/{rnd.randint(1, 9999)}",
+                'area_paper_counts': area_paper_counts
+            }
+
+        snapshot[school] = {'author_count': len(authors), 'authors': authors}
+
+    return snapshot
+
+
+def write_snapshot(directory: str, snapshot: Dict, snapshot_date: date | None = None) -> str:
+    """Writes snapshot as an all-school-scores file in directory and returns its path."""
+    path = os.path.join(directory, snapshot_file_name(snapshot_date or date.today()))
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(snapshot, file)
+    return path
@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from comp_sys_site.services.columnar_index import ColumnarIndex, group_starts, year_prefix_sums, year_range_positions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class VenueMatrices:
+    """
+    School-level totals of a snapshot as one sparse school x area contribution matrix per venue, every entry holding
+    the cumulative-by-year score, paper and leaf counts of that (venue, area, school), like the cells of ColumnarIndex
+    do per author.
+
+    Every score is additive over (venue, year), so the school x area totals of a query are the sum of the selected
+    venues' matrices over its year range, and ranking the schools never walks their authors. A column of the totals
+    only depends on the venues selected in its area: columns are cached, so a query differing from a recent one by one
+    area, as when a checkbox is toggled, only computes that area's column.
+
+    The author x area contributions of each venue are the cells of the ColumnarIndex the matrices are built from. A
+    column also keeps the first of its cells, in index order, that the query selects in each school, which orders the
+    areas of the school as ColumnarIndex.filter_school_data meets them.
+    """
+
+    def __init__(self, index: ColumnarIndex, max_columns: int = 256):
+        start = time.perf_counter()
+        self.index = index
+        self.max_columns = max_columns
+        n_schools, n_areas = max(1, len(index.school_names)), len(index.area_names)
+
+        # entries sorted by venue, then area, then school, so each (venue, area) matrix is one contiguous range
+        entry_keys = (index.row_venue.astype(np.int64) * n_areas + index.row_area) * n_schools + index.row_school
+        rows = np.argsort(entry_keys, kind='stable')
+        entry_keys = entry_keys[rows]
+        starts = group_starts(entry_keys)
+        self.entry_school = (entry_keys[starts] % n_schools).astype(np.int64)
+        self.prefix_sums = year_prefix_sums(starts, index.row_year[rows], index.score_units(index.row_score[rows]),
+                                            index.row_papers[rows])
+
+        matrix_keys = entry_keys[starts] // n_schools
+        matrix_starts = group_starts(matrix_keys)
+        matrix_bounds = np.append(matrix_starts, len(starts)).tolist()
+        self.matrices = {}
+        for i, key in enumerate(matrix_keys[matrix_starts].tolist()):
+            self.matrices[divmod(key, n_areas)] = (matrix_bounds[i], matrix_bounds[i + 1])
+        self.area_venues = [[] for _ in range(n_areas)]
+        for venue_id, area_id in sorted(self.matrices):
+            self.area_venues[area_id].append(venue_id)
+
+        # the cells of each (venue, area) matrix, in index order, so a column can find the first ones it selects
+        cell_keys = index.cell_venue.astype(np.int64) * n_areas + index.cell_area
+        self.matrix_cells = np.argsort(cell_keys, kind='stable')
+        cell_keys = cell_keys[self.matrix_cells]
+        cell_starts = group_starts(cell_keys)
+        cell_bounds = np.append(cell_starts, len(cell_keys)).tolist()
+        self.matrix_cell_ranges = {divmod(key, n_areas): (cell_bounds[i], cell_bounds[i + 1])
+                                   for i, key in enumerate(cell_keys[cell_starts].tolist())}
+        self.cell_school = index.author_school[index.cell_author]
+
+        self._columns = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info(f"Built {len(self.matrices)} venue matrices with {len(starts)} entries "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'VenueMatrices':
+        return cls(snapshot.derived('columnar_index', ColumnarIndex.from_snapshot))
+
+    def _column_key(self, area_id: int, venue_mask: np.ndarray, area_mask: np.ndarray) -> Tuple:
+        if not area_mask[area_id]:
+            return ()
+        return tuple(venue_id for venue_id in self.area_venues[area_id] if venue_mask[venue_id])
+
+    def _compute_column(self, area_id: int, venue_ids: Tuple, low_year: int, high_year: int) -> Tuple:
+        """
+        Adds up the selected venues' matrices of one area.
+
+        :return: The (score units, papers, leaves) rows of the area's totals, and the position of each school's first
+            selected cell in the area, len(index.cell_author) for a school without one.
+        """
+        index = self.index
+        n_schools = len(index.school_names)
+        first_cell = np.full(n_schools, len(index.cell_author), dtype=np.int64)
+        if not venue_ids:
+            return np.zeros((3, n_schools), dtype=np.float64), first_cell
+
+        cells = self.matrix_cells[np.concatenate([np.arange(*self.matrix_cell_ranges[(venue_id, area_id)])
+                                                  for venue_id in venue_ids])]
+        low, high = year_range_positions(index.cell_min_year[cells], index.cell_span[cells], index.cell_offset[cells],
+                                         low_year, high_year)
+        cells = cells[index.cum_leaves[high] > index.cum_leaves[low]]
+        np.minimum.at(first_cell, self.cell_school[cells], cells)
+
+        entries = np.concatenate([np.arange(*self.matrices[(venue_id, area_id)]) for venue_id in venue_ids])
+
+        prefix_sums = self.prefix_sums
+        low, high = year_range_positions(prefix_sums.min_year[entries], prefix_sums.span[entries],
+                                         prefix_sums.offset[entries], low_year, high_year)
+        schools = self.entry_school[entries]
+        return np.stack((
+            np.bincount(schools, weights=prefix_sums.score[high] - prefix_sums.score[low], minlength=n_schools),
+            np.bincount(schools, weights=prefix_sums.papers[high] - prefix_sums.papers[low], minlength=n_schools),
+            np.bincount(schools, weights=prefix_sums.leaves[high] - prefix_sums.leaves[low], minlength=n_schools)
+        )), first_cell
+
+    def _get_column(self, area_id: int, venue_ids: Tuple, low_year: int, high_year: int) -> Tuple:
+        key = (area_id, venue_ids, low_year, high_year)
+        with self._lock:
+            column = self._columns.get(key)
+            if column is not None:
+                self._columns.move_to_end(key)
+                return column
+
+        column = self._compute_column(area_id, venue_ids, low_year, high_year)
+        with self._lock:
+            self._columns[key] = column
+            while len(self._columns) > self.max_columns:
+                self._columns.popitem(last=False)
+        return column
+
+    def _query_columns(self, needed_conferences, needed_areas, low_year, high_year) -> list:
+        index = self.index
+        venue_mask, area_mask = index.query_masks(needed_conferences, needed_areas)
+        return [self._get_column(area_id, self._column_key(area_id, venue_mask, area_mask), low_year, high_year)
+                for area_id in range(len(index.area_names))]
+
+    def area_totals(self, needed_conferences, needed_areas, low_year, high_year) -> np.ndarray:
+        """
+        Returns the school x area totals of a query, as one (score units, papers, leaves) matrix each. When the
+        index has exact_scores, the sums of integer units are exact, whatever the selection of venues.
+
+        :return: An array of shape (3, schools, areas).
+        """
+        columns = self._query_columns(needed_conferences, needed_areas, low_year, high_year)
+        if not columns:
+            return np.zeros((3, len(self.index.school_names), 0), dtype=np.float64)
+        return np.stack([totals for totals, _ in columns], axis=2)
+
+    def filter_school_totals(self, needed_conferences, needed_areas, low_year, high_year,
+                             school_keys: Sequence[str] = None) -> Dict:
+        """
+        Same school-level data as ColumnarIndex.filter_school_data, without the authors: the author count, area
+        scores, total score and area paper counts of every school, computed from the venue matrices. The areas of a
+        school are in the order its selected cells first reach them, as in ColumnarIndex.filter_school_data.
+
+        :param school_keys: The key of each school in the result, e.g. its display name, instead of its raw name.
+        """
+        index = self.index
+        school_keys = index.school_names if school_keys is None else school_keys
+        columns = self._query_columns(needed_conferences, needed_areas, low_year, high_year)
+        if not columns:
+            return {school_keys[school_id]: {'author_count': index.school_author_counts[school_id], 'area_scores': {},
+                                             'total_score': 0, 'area_paper_counts': {}}
+                    for school_id in range(len(index.school_names))}
+        units, papers, _ = np.stack([totals for totals, _ in columns], axis=2)
+        units, papers = index.round_units(units).tolist(), np.rint(papers).astype(np.int64).tolist()
+        first_cells = np.stack([first_cell for _, first_cell in columns], axis=1)
+        # areas without a selected cell sort last, after the school's active ones
+        area_order = np.argsort(first_cells, axis=1, kind='stable').tolist()
+        active_counts = np.count_nonzero(first_cells < len(index.cell_author), axis=1).tolist()
+
+        filtered_school_data = {}
+        for school_id, (order, active_count) in enumerate(zip(area_order, active_counts)):
+            area_ids = order[:active_count]
+            school_units, school_papers = units[school_id], papers[school_id]
+            total_units = sum(school_units[area_id] for area_id in area_ids)
+            filtered_school_data[school_keys[school_id]] = {
+                'author_count': index.school_author_counts[school_id],
+                'area_scores': {index.area_names[area_id]: school_units[area_id] / index.score_scale
+                                for area_id in area_ids},
+                'total_score': total_units / index.score_scale if area_ids else 0,
+                'area_paper_counts': {index.area_names[area_id]: school_papers[area_id] for area_id in area_ids}
+            }
+
+        return filtered_school_data
@@ -1,3 +1,924 @@
-from django.test import TestCase
+import copy
+import gzip
+import json
+import os
+import random
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+import brotli
+import numpy as np
+from django.test import RequestFactory, SimpleTestCase
+
+from comp_sys_site.services.all_conferences import conferences
+from comp_sys_site.services.area_conference_mapping import CategorizeVenue
+from comp_sys_site.services.columnar_index import BINARY_FORMAT_VERSION, ColumnarIndex
+from comp_sys_site.services.data_getters import filter_snapshot_data, get_default_ranking_json, \
+    get_institution_breakdown, get_ranking, warm_up
+from comp_sys_site.services.data_processing import DataProcessing, non_area_keys
+from comp_sys_site.services.date_time_utils import get_current_year
+from comp_sys_site.services.file_utils import FileUtils, Snapshot, SnapshotCache, SnapshotRefresher
+from comp_sys_site.services.http_cache import REVALIDATE, encode_payload, payload_response
+from comp_sys_site.services.parallel_filter import ShardedSchoolFilter
+from comp_sys_site.services.records import SchoolRecords
+from comp_sys_site.services.reference_pipeline import ReferencePipeline
+from comp_sys_site.services.result_cache import ResultCache
+from comp_sys_site.services.serializers import JsonSerializer, get_serializer, serializers
+from comp_sys_site.services.synthetic_snapshot import generate_snapshot
+from comp_sys_site.services.venue_matrices import VenueMatrices
+from comp_sys_site.views import API_CACHE_CONTROL, API_FORMAT_VERSION, ROW_LIMIT, get_api_version
+
+
+class DirectoryS3Client:
+    """Stand-in for the boto3 S3 client that keeps each bucket as a local directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def list_objects_v2(self, Bucket, Prefix):
+        folder = self._path(Bucket, Prefix)
+        if not os.path.isdir(folder):
+            return {}
+        contents = [{'Key': Prefix + name} for name in sorted(os.listdir(folder))]
+        return {'Contents': contents} if contents else {}
+
+    def download_file(self, bucket, key, local_path):
+        shutil.copyfile(self._path(bucket, key), local_path)
+
+    def copy_object(self, Bucket, CopySource, Key):
+        os.makedirs(os.path.dirname(self._path(Bucket, Key)), exist_ok=True)
+        shutil.copyfile(self._path(CopySource['Bucket'], CopySource['Key']), self._path(Bucket, Key))
+
+    def delete_object(self, Bucket, Key):
+        os.remove(self._path(Bucket, Key))
+
+
+class SnapshotRefresherTests(SimpleTestCase):
+    old_name = 'all-school-scores-final-January-1-2020'
+    new_name = 'all-school-scores-final-March-1-2024'
+    school_data = {
+        'purdue university': {
+            'author_count': 1,
+            'authors': {
+                'Jane Doe': {
+                    'paper_count': 1,
+                    'dblp_link': 'https://dblp.org/pid/1',
+                    'area_paper_counts': {'operating_systems': {'SOSP': {'2021': {'score': 0.5, 'year_paper_count': 1}}}}
+                }
+            }
+        }
+    }
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.file_dir = os.path.join(self.root, 'required_files')
+        os.makedirs(os.path.join(self.file_dir, 'backup'))
+        with open(os.path.join(self.file_dir, self.old_name), 'w', encoding='utf-8') as file:
+            json.dump(self.school_data, file)
+
+        self.s3 = DirectoryS3Client(os.path.join(self.root, 's3'))
+        os.makedirs(os.path.join(self.root, 's3', 'bucket', 'current'))
+        self.refresher = SnapshotRefresher(FileUtils(), s3_client_factory=lambda: self.s3, bucket_name='bucket',
+                                           file_dir=self.file_dir)
+
+    def put_s3_snapshot(self, content: str):
+        with open(os.path.join(self.root, 's3', 'bucket', 'current', self.new_name), 'w', encoding='utf-8') as file:
+            file.write(content)
+
+    def test_refresh_swaps_in_valid_snapshot(self):
+        self.put_s3_snapshot(json.dumps(self.school_data))
+
+        self.refresher.request_refresh()
+        self.refresher.wait(10)
+
+        self.assertEqual(self.refresher.last_refreshed_path, os.path.join(self.file_dir, self.new_name))
+        self.assertTrue(os.path.exists(os.path.join(self.file_dir, self.new_name)))
+        self.assertFalse(os.path.exists(os.path.join(self.file_dir, self.old_name)))
+        self.assertEqual(os.listdir(os.path.join(self.file_dir, 'backup')), [self.old_name])
+        self.assertTrue(os.path.isdir(os.path.join(self.file_dir, 'binary', self.new_name)))
+        self.assertEqual(os.listdir(os.path.join(self.root, 's3', 'bucket', 'backup')), [self.new_name])
+        self.assertEqual(os.listdir(os.path.join(self.root, 's3', 'bucket', 'current')), [])
+
+    def test_invalid_snapshot_keeps_serving_old_file(self):
+        self.put_s3_snapshot('{"purdue university": {"author_count": 1, "authors": ')
+
+        self.assertIsNone(self.refresher.refresh())
+
+        self.assertTrue(os.path.exists(os.path.join(self.file_dir, self.old_name)))
+        self.assertFalse(os.path.exists(os.path.join(self.file_dir, self.new_name)))
+        self.assertEqual(os.listdir(os.path.join(self.file_dir, 'incoming')), [])
+        self.assertEqual(os.listdir(os.path.join(self.root, 's3', 'bucket', 'current')), [self.new_name])
+
+    def test_refresh_requests_are_throttled(self):
+        self.assertTrue(self.refresher.request_refresh())
+        self.refresher.wait(10)
+        self.assertFalse(self.refresher.request_refresh())
+
+
+class SnapshotCacheTests(SimpleTestCase):
+    old_name = 'all-school-scores-final-January-1-2020'
+    new_name = 'all-school-scores-final-March-1-2024'
+
+    def setUp(self):
+        self.file_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.file_dir)
+        os.makedirs(os.path.join(self.file_dir, 'backup'))
+        self.write_snapshot(self.old_name, SnapshotRefresherTests.school_data)
+        self.cache = SnapshotCache(FileUtils(), file_dir=self.file_dir)
+
+    def write_snapshot(self, name: str, data, mtime_ns: int = 10 ** 18):
+        path = os.path.join(self.file_dir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(data if isinstance(data, str) else json.dumps(data))
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def touch_dir(self, mtime_ns: int):
+        os.utime(self.file_dir, ns=(mtime_ns, mtime_ns))
+
+    def assert_counts(self, hits: int, misses: int, reloads: int):
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['reloads']), (hits, misses, reloads))
+
+    def test_unchanged_files_are_not_reloaded(self):
+        snapshot = self.cache.get()
+
+        self.assertEqual(snapshot.path, os.path.join(self.file_dir, self.old_name))
+        self.assertEqual(list(snapshot.data), ['purdue university'])
+        self.assertIs(self.cache.get(), snapshot)
+        self.assert_counts(hits=1, misses=1, reloads=1)
+        self.assertEqual(self.cache.stats()['hit_rate'], 0.5)
+
+    def test_modified_file_is_reloaded(self):
+        snapshot = self.cache.get()
+        data = copy.deepcopy(SnapshotRefresherTests.school_data)
+        data['texas a&m university'] = data['purdue university']
+        self.write_snapshot(self.old_name, data, mtime_ns=2 * 10 ** 18)
+
+        reloaded = self.cache.get()
+        self.assertIsNot(reloaded, snapshot)
+        self.assertEqual(list(reloaded.data), ['purdue university', 'texas a&m university'])
+        self.assert_counts(hits=0, misses=2, reloads=2)
+
+    def test_new_file_in_directory_is_loaded(self):
+        self.cache.get()
+        os.remove(os.path.join(self.file_dir, self.old_name))
+        self.write_snapshot(self.new_name, SnapshotRefresherTests.school_data)
+        self.touch_dir(3 * 10 ** 18)
+
+        self.assertEqual(self.cache.get().path, os.path.join(self.file_dir, self.new_name))
+        self.assert_counts(hits=0, misses=2, reloads=2)
+
+    def test_unreadable_file_keeps_previous_snapshot(self):
+        snapshot = self.cache.get()
+        self.write_snapshot(self.old_name, '{"purdue university": {"author_count": 1, "authors": ',
+                            mtime_ns=2 * 10 ** 18)
+
+        self.assertIs(self.cache.get(), snapshot)
+        self.assert_counts(hits=0, misses=2, reloads=1)
+
+    def test_missing_file_returns_none(self):
+        os.remove(os.path.join(self.file_dir, self.old_name))
+
+        self.assertIsNone(self.cache.get())
+        self.assert_counts(hits=0, misses=1, reloads=0)
+
+    def test_stale_snapshot_is_refreshed_unless_disabled(self):
+        refresher = mock.Mock()
+        cache = SnapshotCache(FileUtils(), refresher=refresher, file_dir=self.file_dir)
+
+        cache.get(refresh=False)
+        cache.get(refresh=False)
+        refresher.request_refresh.assert_not_called()
+        cache.get()
+        refresher.request_refresh.assert_called_once()
+
+    def test_warm_up_does_not_refresh(self):
+        refresher = mock.Mock()
+        cache = SnapshotCache(FileUtils(), refresher=refresher, file_dir=self.file_dir)
+
+        with mock.patch('comp_sys_site.services.data_getters.snapshot_cache', cache):
+            self.assertTrue(warm_up(3))
+        refresher.request_refresh.assert_not_called()
+
+
+class IterJsonObjectItemsTests(SimpleTestCase):
+    documents = [
+        '{}',
+        ' \n{ \t}\n',
+        '{"a":1}',
+        '{"a": -1.5e3, "b": 10, "c": 0.000125, "d": 12345678901234567890}',
+        '{"n": null, "t": true, "f": false, "list": [1, [2, {"x": []}], {}]}',
+        '{"nested": {"school": {"authors": {"Jane": {"2021": {"score": 0.5, "year_paper_count": 1}}}}}, "next": {}}',
+        '{"café 大学": "über", "emoji": "😀", "escaped": "\\ud83d\\ude00 \\u00e9"}',
+        '{"quote \\" key": "a \\\\ b \\" c \\n d \\/", "comma, colon: brace}": "{[,:]}"}',
+        '{\n  "spaced" :\n  [ 1 ,2 ] ,\n  "last" : -0\n}\n',
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, content: str) -> str:
+        path = os.path.join(self.directory, 'snapshot.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_items_match_json_load_at_any_chunk_size(self):
+        for document in self.documents:
+            path = self.write(document)
+            for chunk_size in (1, 2, 7, 1 << 20):
+                with self.subTest(document=document, chunk_size=chunk_size):
+                    self.assertEqual(list(FileUtils.iter_json_object_items(path, chunk_size)),
+                                     list(json.loads(document).items()))
+
+    def test_numbers_split_at_every_position(self):
+        document = '{"a": 123456, "b": -7.25e-3, "c": 1E+2}'
+        path = self.write(document)
+        for chunk_size in range(1, len(document) + 1):
+            self.assertEqual(dict(FileUtils.iter_json_object_items(path, chunk_size)), json.loads(document))
+
+    def test_invalid_documents_raise(self):
+        for document in ('', '[]', '{"a": 1', '{"a" 1}', '{"a": 1 "b": 2}', '{"a": tru}', '{"a": "open}'):
+            path = self.write(document)
+            for chunk_size in (1, 7):
+                with self.subTest(document=document, chunk_size=chunk_size):
+                    with self.assertRaises(json.JSONDecodeError):
+                        list(FileUtils.iter_json_object_items(path, chunk_size))
+
+
+class PayloadResponseTests(SimpleTestCase):
+    body = json.dumps({'sorted_ranks': {f'school {i}': {'average_count': i} for i in range(200)}}).encode('utf-8')
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.payload = encode_payload(self.body)
+
+    def test_gzip_is_served_when_accepted(self):
+        response = payload_response(self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate'), self.payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['ETag'], self.payload.etag)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_brotli_is_preferred_when_accepted(self):
+        response = payload_response(self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate, br'), self.payload)
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+        self.assertEqual(response['ETag'], self.payload.etag)
+
+    def test_identity_is_served_otherwise(self):
+        response = payload_response(self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip;q=0'), self.payload)
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+
+    def test_matching_etag_returns_not_modified(self):
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=f'"other", {self.payload.etag.removeprefix("W/")}')
+        response = payload_response(request, self.payload)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], self.payload.etag)
+
+    def test_small_bodies_are_not_compressed(self):
+        payload = encode_payload(b'{"pub_distribution": null}')
+
+        self.assertIsNone(payload.gzip)
+        self.assertIsNone(payload.br)
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(max_entries=2)
+        cache.put('v1', 'a', b'a')
+        cache.put('v1', 'b', b'b')
+        cache.get('v1', 'a')
+        cache.put('v1', 'c', b'c')
+
+        self.assertIsNone(cache.get('v1', 'b'))
+        self.assertEqual((cache.get('v1', 'a'), cache.get('v1', 'c')), (b'a', b'c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_are_evicted_to_stay_within_max_bytes(self):
+        cache = ResultCache(max_bytes=10)
+        cache.put('v1', 'a', b'x' * 4)
+        cache.put('v1', 'b', b'x' * 4)
+        cache.put('v1', 'c', b'x' * 4)
+
+        self.assertIsNone(cache.get('v1', 'a'))
+        self.assertEqual(cache.stats()['bytes'], 8)
+
+    def test_oversized_values_are_not_stored(self):
+        cache = ResultCache(max_bytes=10)
+        cache.put('v1', 'a', b'x' * 4)
+        cache.put('v1', 'big', b'x' * 11)
+
+        self.assertIsNone(cache.get('v1', 'big'))
+        self.assertEqual(cache.get('v1', 'a'), b'x' * 4)
+        self.assertEqual(cache.stats()['evictions'], 0)
+
+    def test_entries_expire_after_ttl(self):
+        cache = ResultCache(ttl_seconds=10)
+        with mock.patch('comp_sys_site.services.result_cache.time.monotonic', return_value=100.0):
+            cache.put('v1', 'a', b'a')
+        with mock.patch('comp_sys_site.services.result_cache.time.monotonic', return_value=109.0):
+            self.assertEqual(cache.get('v1', 'a'), b'a')
+        with mock.patch('comp_sys_site.services.result_cache.time.monotonic', return_value=110.0):
+            self.assertIsNone(cache.get('v1', 'a'))
+
+        self.assertEqual((cache.stats()['expirations'], cache.stats()['size'], cache.stats()['bytes']), (1, 0, 0))
+
+    def test_new_version_drops_every_entry(self):
+        cache = ResultCache()
+        cache.put('v1', 'a', b'a')
+
+        self.assertIsNone(cache.get('v2', 'a'))
+        cache.put('v2', 'b', b'b')
+        self.assertIsNone(cache.get('v1', 'b'))
+        self.assertEqual(cache.stats()['invalidations'], 2)
+        self.assertEqual(cache.stats()['version'], 'v1')
+
+    def test_get_or_compute_only_computes_misses(self):
+        cache = ResultCache()
+        compute = mock.Mock(return_value=b'value')
+
+        self.assertEqual(cache.get_or_compute('v1', 'a', compute), b'value')
+        self.assertEqual(cache.get_or_compute('v1', 'a', compute), b'value')
+        compute.assert_called_once_with()
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate'], stats['size']), (1, 1, 0.5, 1))
+
+    def test_equivalent_queries_share_a_key(self):
+        key = ResultCache.make_key(['SOSP', 'ASPLOS'], 1990, 2010)
+
+        self.assertEqual(ResultCache.make_key(['ASPLOS', ' SOSP ', 'SOSP', '', '  '], '1990', 2010), key)
+        self.assertEqual(key, (('ASPLOS', 'SOSP'), 1990, 2010))
+        self.assertNotEqual(ResultCache.make_key(['SOSP'], 1990, 2010), key)
+
+
+class CategorizeVenueTests(SimpleTestCase):
+    def setUp(self):
+        self.categorizer = CategorizeVenue()
+
+    def test_names_are_normalized(self):
+        self.assertEqual(self.categorizer.categorize_venue('USENIX-Security-Symposium'), 'computer_security')
+        self.assertEqual(self.categorizer.categorize_venue('sigmod  conference'), 'databases')
+        self.assertEqual(self.categorizer.categorize_venue('ESEC-SIGSOFT-FSE'), 'software_engineering')
+        self.assertEqual(self.categorizer.categorize_venue('MICRO (3)'), 'computer_architecture')
+
+    def test_usenix_atc_and_fast_are_separate_venues(self):
+        self.assertEqual(self.categorizer.categorize_venue('USENIX-ATC-Short'), 'operating_systems')
+        self.assertEqual(self.categorizer.categorize_venue('USENIX-FAST'), 'operating_systems')
+        self.assertIsNone(self.categorizer.categorize_venue('USENIX ATCUSENIX FAST'))
+
+    def test_unknown_venues(self):
+        self.assertIsNone(self.categorizer.categorize_venue('NeurIPS'))
+        self.assertIsNone(self.categorizer.categorize_venue(''))
+
+    def test_venues_in_area(self):
+        self.assertIn('usenix atc', self.categorizer.venues_in_area('operating_systems'))
+        self.assertEqual(self.categorizer.venues_in_area('unknown'), frozenset())
+
+
+class SerializerTests(SimpleTestCase):
+    data = {
+        'sorted_ranks': {
+            'Université de Montréal': {'average_count': 1.25, 'author_count': np.int64(3), 'score': Decimal('0.5')},
+            'Purdue University': {'area_scores': np.array([1.5, 2.0]), 'top_areas': ['databases'], 'link': None}
+        }
+    }
+
+    def installed_serializers(self):
+        for name in serializers:
+            try:
+                yield get_serializer(name)
+            except ValueError:
+                continue
+
+    def test_serializers_write_the_same_values(self):
+        expected = JsonSerializer().dumps(self.data)
+        self.assertEqual(json.loads(expected)['sorted_ranks']['Purdue University']['area_scores'], [1.5, 2.0])
+
+        data = {'small': [5e-05, 1e-06, 1e20, 0.1 + 0.2, -0.0]}
+        for serializer in self.installed_serializers():
+            self.assertEqual(json.loads(serializer.dumps(self.data)), json.loads(expected), serializer.name)
+            self.assertEqual(json.loads(serializer.dumps(data)), data, serializer.name)
+
+    def test_json_serializer_rejects_nan(self):
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                JsonSerializer().dumps({'average_count': value})
+
+    def test_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            get_serializer('pickle')
+
+
+class TopAreasTests(SimpleTestCase):
+    def test_batch_matches_find_max_with_proximity(self):
+        data_processor = DataProcessing()
+        rnd = random.Random(3)
+        authors = []
+        for _ in range(2000):
+            # few distinct values, so ties and runner-ups right at the 5% boundary are common
+            areas = rnd.sample(['a', 'b', 'c', 'd', 'e'], rnd.randint(0, 5))
+            authors.append({'paper_count': 1, 'dblp_link': 'link', 'area_paper_counts': {},
+                            **{area: rnd.choice([0.0, 0.95, 1.0, 1.9, 2.0, 2.5, 4.75, 5.0]) for area in areas}})
+
+        expected = []
+        for author_data in authors:
+            scores = {key: value for key, value in author_data.items()
+                      if key not in ('paper_count', 'dblp_link', 'area_paper_counts')}
+            top_scores = data_processor.find_max_with_proximity(list(scores.values()), proximity=5)
+            expected.append([area for area, score in scores.items() if score in top_scores])
+
+        data_processor.add_top_areas(authors)
+        self.assertEqual([author_data['top_areas'] for author_data in authors], expected)
+
+
+class ApiViewTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'all-school-scores-final-March-1-2024')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(GoldenOutputTests.build_snapshot_data(), file)
+        self.snapshot = Snapshot(self.path, GoldenOutputTests.build_snapshot_data(), os.stat(self.path))
+        patcher = mock.patch('comp_sys_site.views.get_current_snapshot', return_value=self.snapshot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def canonical_url(self, path: str, query: list) -> str:
+        return f'{path}?{urlencode(query + [("v", get_api_version(self.snapshot))])}'
+
+    def test_query_is_redirected_to_canonical_url(self):
+        response = self.client.get('/api/rankings?to=2010&areas=SOSP,ASPLOS,SOSP&from=1990')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], self.canonical_url('/api/rankings', [
+            ('areas', 'ASPLOS,SOSP'), ('from', 1990), ('to', 2010), ('offset', 0), ('limit', ROW_LIMIT)]))
+        self.assertEqual(response['Cache-Control'], REVALIDATE)
+
+    def test_canonical_url_is_immutable(self):
+        url = self.canonical_url('/api/rankings', [('areas', 'ASPLOS,SOSP'), ('from', 1990), ('to', 2010),
+                                                   ('offset', 0), ('limit', 2)])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], API_CACHE_CONTROL)
+        self.assertEqual(len(json.loads(response.content)['sorted_ranks']), 2)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_invalid_years_are_rejected(self):
+        for years in ('from=99999999999999999999999', 'from=0', 'from=1969', 'to=3000', 'from=2010&to=1990',
+                      'from=abc'):
+            response = self.client.get(f'/api/rankings?areas=SOSP&{years}')
+            self.assertEqual(response.status_code, 400, years)
+            response = self.client.get(f'/api/rankings/authors?areas=SOSP&{years}&institution=x')
+            self.assertEqual(response.status_code, 400, years)
+
+        response = self.client.post('/', {'areas[]': ['SOSP'], 'start_year': '99999999999999999999999'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_institution_authors(self):
+        query = [('areas', ','.join(sorted(conferences))), ('from', 1970), ('to', 2024)]
+        institution = next(iter(get_ranking(conferences, 1970, 2024, self.snapshot).page(0, 1)))
+
+        response = self.client.get(self.canonical_url('/api/rankings/authors', query + [('institution', institution)]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)['authors'])
+
+        for path in ('/api/rankings/authors', '/api/rankings/breakdown'):
+            response = self.client.get(self.canonical_url(path, query + [('institution', 'Unknown University')]))
+            self.assertEqual(response.status_code, 404)
+
+    def test_version_only_depends_on_content(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        copy_path = os.path.join(directory, os.path.basename(self.path))
+        shutil.copyfile(self.path, copy_path)
+        os.utime(copy_path, ns=(0, 0))
+
+        copy = Snapshot(copy_path, None, os.stat(copy_path))
+        self.assertEqual(copy.version, self.snapshot.version)
+        self.assertNotEqual(copy.identity, self.snapshot.identity)
+
+        # republished under the same name with the same size, but different content
+        with open(copy_path, 'r+b') as file:
+            content = file.read()
+            file.seek(0)
+            file.write(content.replace(b'1', b'2', 1))
+        self.assertEqual(os.path.getsize(copy_path), os.path.getsize(self.path))
+        self.assertNotEqual(Snapshot(copy_path, None, os.stat(copy_path)).version, self.snapshot.version)
+
+    def test_version_includes_payload_format(self):
+        self.assertEqual(get_api_version(self.snapshot), f'{API_FORMAT_VERSION}.{self.snapshot.version}')
+        url = self.canonical_url('/api/rankings', [('areas', 'ASPLOS,SOSP'), ('from', 1990), ('to', 2010),
+                                                   ('offset', 0), ('limit', 2)])
+        with mock.patch('comp_sys_site.views.API_FORMAT_VERSION', API_FORMAT_VERSION + 1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(f'v={API_FORMAT_VERSION + 1}.{self.snapshot.version}', response['Location'])
+
+
+class DefaultRankingTests(SimpleTestCase):
+    def snapshot(self, data: dict) -> Snapshot:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'all-school-scores-final-March-1-2024')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        return Snapshot(path, data, os.stat(path))
+
+    def test_page_is_built_from_the_given_snapshot(self):
+        old = self.snapshot(GoldenOutputTests.build_snapshot_data())
+        new = self.snapshot(SnapshotRefresherTests.school_data)
+
+        # a reload between the view's lookup and the build must not put the new snapshot's page on the old one
+        with mock.patch('comp_sys_site.services.data_getters.snapshot_cache.get', return_value=new):
+            page = json.loads(get_default_ranking_json(3, old))
+
+        self.assertEqual(page['total'], len(GoldenOutputTests.schools))
+        self.assertEqual(list(page['sorted_ranks']), list(get_ranking(conferences, 1970, get_current_year(),
+                                                                      old).page(0, 3)))
+
+
+class GoldenOutputTests(SimpleTestCase):
+    """Checks the index-based pipeline against the original dict-walking DataProcessing pipeline."""
+    venues = {
+        'computer_architecture': ['ASPLOS', 'ISCA', 'MICRO'],
+        'operating_systems': ['SOSP', 'OSDI', 'USENIX-FAST'],
+        'databases': ['SIGMOD-Conference', 'VLDB'],
+        'computer_security': ['CCS', 'USENIX-Security']
+    }
+    schools = ['purdue university west lafayette', 'texas a&m university', 'university-of-somewhere',
+               'state university of new york at buffalo']
+
+    @classmethod
+    def build_snapshot_data(cls) -> dict:
+        rnd = random.Random(7)
+        data = {}
+        for school in cls.schools:
+            authors = {}
+            for number in range(rnd.randint(10, 20)):
+                area_paper_counts = {}
+                for area in rnd.sample(list(cls.venues), rnd.randint(0, 4)):
+                    area_paper_counts[area] = {
+                        # quarter-point scores keep every sum exact, so the outputs can be compared exactly, and
+                        # make equal and nearly equal area scores common
+                        venue: {str(year): {'score': rnd.randint(3, 5) / 4, 'year_paper_count': rnd.randint(1, 3)}
+                                for year in rnd.sample(range(1975, 2024), rnd.randint(1, 2))}
+                        for venue in rnd.sample(cls.venues[area], rnd.randint(1, 2))
+                    }
+                # the digits are stripped from display names, so numbers 0 and 1 end up with the same name
+                author = f'Author {chr(65 + number // 2)}{chr(65 + max(number, 1) % 2)} {number:04d}'
+                authors[author] = {
+                    'paper_count': 0,
+                    'dblp_link': f'https://dblp.org/pid/{number}',
+                    'area_paper_counts': area_paper_counts
+                }
+            data[school] = {'author_count': len(authors), 'authors': authors}
+        return data
+
+    def setUp(self):
+        self.data = self.build_snapshot_data()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'all-school-scores-final-March-1-2024')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.data, file)
+        self.snapshot = Snapshot(path, self.data, os.stat(path))
+
+    def reference_ranking(self, required_conferences, start_year, end_year) -> dict:
+        data_processor = ReferencePipeline()
+        categorizer = CategorizeVenue()
+        areas = {categorizer.categorize_venue(conf) for conf in required_conferences}
+        filtered = data_processor.filter_school_data(json.loads(json.dumps(self.data)), required_conferences, areas,
+                                                     start_year, end_year)
+        ranking = data_processor.sort_institutions_by_average_count(data_processor.format_university_data(filtered))
+        data_processor.sort_authors_by_total_score(ranking)
+        data_processor.filter_author_areas(ranking)
+        return ranking
+
+    def queries(self):
+        yield conferences, 1970, 2024
+        yield ['ASPLOS', 'SOSP', 'USENIX-FAST', 'VLDB'], 1990, 2010
+        yield ['CCS', 'USENIX-Security', 'MICRO'], 2000, 2000
+
+    @staticmethod
+    def serialize(ranking: dict) -> str:
+        """
+        Serializes a ranking so that the order of schools, authors, venues and years is compared too. The keys of an
+        author are sorted: the reference keeps the snapshot's key order there, the index always writes the same one.
+        Average counts are rounded, the reference's pow of a product and the log-space mean differ in the last digits.
+        """
+        return json.dumps({
+            school: {**data, 'average_count': round(data['average_count'], 9),
+                     'authors': {author: dict(sorted(author_data.items()))
+                                 for author, author_data in data['authors'].items()}}
+            for school, data in ranking.items()
+        })
+
+    def test_filtered_data_matches_reference(self):
+        for query in self.queries():
+            expected = self.reference_ranking(*query)
+            data_processor = DataProcessing()
+            actual = filter_snapshot_data(*query, snapshot=self.snapshot, display_names=True, include_top_areas=True)
+            data_processor.add_average_counts(actual)
+            actual = data_processor.sort_authors_by_total_score(
+                data_processor.sort_institutions_by_average_count(actual))
+            self.assertEqual(self.serialize(actual), self.serialize(expected), query)
+
+    def test_ranking_matches_reference(self):
+        for query in self.queries():
+            expected = self.reference_ranking(*query)
+            ranking = get_ranking(*query, snapshot=self.snapshot)
+
+            page = ranking.page(0, len(ranking))
+            self.assertEqual(list(page), list(expected))
+            for institution, data in expected.items():
+                self.assertAlmostEqual(page[institution]['average_count'], data['average_count'], places=9)
+                self.assertEqual(page[institution]['area_scores'], data['area_scores'])
+
+                authors = ranking.authors(institution)
+                self.assertEqual(list(authors), list(data['authors']))
+                for author, author_data in data['authors'].items():
+                    summary = {key: value for key, value in author_data.items() if key != 'area_paper_counts'}
+                    self.assertEqual({key: value for key, value in authors[author].items()
+                                      if key != 'area_paper_counts'}, summary)
+
+                breakdown = get_institution_breakdown(*query, institution, snapshot=self.snapshot)
+                self.assertEqual(json.dumps(breakdown), json.dumps({
+                    author: author_data['area_paper_counts'] for author, author_data in data['authors'].items()
+                }))
+
+
+class ColumnarIndexTests(SimpleTestCase):
+    """Checks ColumnarIndex.filter_school_data against the dict walk of DataProcessing.filter_school_data."""
+
+    def setUp(self):
+        self.data = GoldenOutputTests.build_snapshot_data()
+        self.index = ColumnarIndex.from_school_data(self.data)
+
+    def queries(self):
+        yield from GoldenOutputTests().queries()
+        yield [], 1970, 2024
+        yield ['SOSP', 'NOT-A-VENUE'], 1970, 2024
+        yield conferences, 1900, 1960
+        yield conferences, 2030, 2040
+        yield conferences, 2010, 1990
+
+    def assert_same_filtered_data(self, actual: dict, expected: dict):
+        self.assertEqual(list(actual), list(expected))
+        for school, expected_data in expected.items():
+            actual_data = actual[school]
+            self.assertEqual(list(actual_data), list(expected_data))
+            self.assertEqual(actual_data['author_count'], expected_data['author_count'])
+            self.assertEqual(json.dumps(actual_data['area_scores']), json.dumps(expected_data['area_scores']))
+            self.assertEqual(actual_data['total_score'], expected_data['total_score'])
+            self.assertEqual(json.dumps(actual_data['area_paper_counts']),
+                             json.dumps(expected_data['area_paper_counts']))
+
+            self.assertEqual(list(actual_data['authors']), list(expected_data['authors']))
+            for author, expected_author in expected_data['authors'].items():
+                actual_author = actual_data['authors'][author]
+                # the reference keeps the snapshot's order of the author keys, the areas come last in both
+                self.assertEqual(sorted(actual_author), sorted(expected_author))
+                self.assertEqual([key for key in actual_author if key not in non_area_keys],
+                                 [key for key in expected_author if key not in non_area_keys])
+                self.assertEqual(json.dumps(actual_author['area_paper_counts']),
+                                 json.dumps(expected_author['area_paper_counts']))
+                for key, value in expected_author.items():
+                    self.assertEqual(actual_author[key], value, key)
+
+    def test_filter_matches_dict_pipeline(self):
+        categorizer = CategorizeVenue()
+        for confs, low_year, high_year in self.queries():
+            areas = {categorizer.categorize_venue(conf) for conf in confs}
+            expected = ReferencePipeline().filter_school_data(copy.deepcopy(self.data), confs, areas, low_year,
+                                                              high_year)
+            with self.subTest(confs=confs[:5], low_year=low_year, high_year=high_year):
+                self.assert_same_filtered_data(self.index.filter_school_data(confs, areas, low_year, high_year),
+                                               expected)
+
+    def test_query_without_matches_keeps_every_school(self):
+        filtered = self.index.filter_school_data(conferences, set(), 1970, 2024)
+
+        self.assertEqual(list(filtered), list(self.data))
+        for school, data in filtered.items():
+            self.assertEqual(data['author_count'], self.data[school]['author_count'])
+            self.assertEqual((data['area_scores'], data['total_score'], data['area_paper_counts']), ({}, 0, {}))
+
+
+class BinaryIndexTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.source_path = os.path.join(directory, 'all-school-scores-final-March-1-2024')
+        with open(self.source_path, 'w', encoding='utf-8') as file:
+            json.dump(GoldenOutputTests.build_snapshot_data(), file)
+        self.binary_path = os.path.join(directory, 'binary')
+        self.index = ColumnarIndex.from_school_data(GoldenOutputTests.build_snapshot_data())
+        self.index.save(self.binary_path, source_path=self.source_path)
+
+    def test_round_trip(self):
+        loaded = ColumnarIndex.load(self.binary_path, source_path=self.source_path)
+
+        for field in ColumnarIndex.array_fields:
+            np.testing.assert_array_equal(getattr(loaded, field), getattr(self.index, field), err_msg=field)
+            self.assertEqual(getattr(loaded, field).dtype, getattr(self.index, field).dtype, field)
+        for field in ColumnarIndex.list_fields:
+            self.assertEqual(getattr(loaded, field), getattr(self.index, field), field)
+        self.assertEqual((loaded.score_scale, loaded.exact_scores), (self.index.score_scale, self.index.exact_scores))
+        self.assertEqual(loaded.filter_school_data(conferences, {'databases', 'operating_systems'}, 1990, 2010),
+                         self.index.filter_school_data(conferences, {'databases', 'operating_systems'}, 1990, 2010))
+
+    def test_index_of_another_file_is_rejected(self):
+        stat_result = os.stat(self.source_path)
+        os.utime(self.source_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(ColumnarIndex.load(self.binary_path, source_path=self.source_path))
+        os.utime(self.source_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+        self.assertIsNotNone(ColumnarIndex.load(self.binary_path, source_path=self.source_path))
+
+        with open(self.source_path, 'a', encoding='utf-8') as file:
+            file.write(' ')
+        os.utime(self.source_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+        self.assertIsNone(ColumnarIndex.load(self.binary_path, source_path=self.source_path))
+
+        renamed_path = os.path.join(os.path.dirname(self.source_path), 'all-school-scores-final-April-1-2024')
+        shutil.copy2(self.source_path, renamed_path)
+        self.assertIsNone(ColumnarIndex.load(self.binary_path, source_path=renamed_path))
+
+    def test_other_format_version_is_rejected(self):
+        meta_path = os.path.join(self.binary_path, 'meta.json')
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        meta['format_version'] = BINARY_FORMAT_VERSION - 1
+        with open(meta_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+
+        self.assertIsNone(ColumnarIndex.load(self.binary_path, source_path=self.source_path))
+        self.assertIsNone(ColumnarIndex.load(os.path.join(self.binary_path, 'missing')))
+
+
+class SyntheticSnapshotTests(SimpleTestCase):
+    def test_every_venue_is_a_queryable_conference(self):
+        data = generate_snapshot(schools=20, authors_per_school=10, seed=1)
+        index = ColumnarIndex.from_school_data(data)
+
+        self.assertLessEqual(set(index.venue_names), set(conferences))
+        areas = {CategorizeVenue().categorize_venue(conf) for conf in conferences}
+        self.assertEqual(index.count_cells(conferences, areas), len(index.cell_author))
+        self.assertEqual(generate_snapshot(schools=20, authors_per_school=10, seed=1), data)
+
+
+class ShardedSchoolFilterTests(SimpleTestCase):
+    def test_sharded_result_matches_in_process_result(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'all-school-scores-final-March-1-2024')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(GoldenOutputTests.build_snapshot_data(), file)
+        index = ColumnarIndex.from_school_items(FileUtils.iter_json_object_items(path))
+        binary_path = os.path.join(directory, 'binary')
+        index.save(binary_path, source_path=path)
+
+        school_filter = ShardedSchoolFilter(workers=2, min_cells=0)
+        self.addCleanup(school_filter.shutdown)
+        query = {'needed_conferences': ['ASPLOS', 'SOSP', 'VLDB', 'CCS'],
+                 'needed_areas': {'computer_architecture', 'operating_systems', 'databases', 'computer_security'},
+                 'low_year': 1980, 'high_year': 2020, 'include_top_areas': True}
+
+        self.assertTrue(school_filter.should_shard(index, query['needed_conferences'], query['needed_areas']))
+        self.assertGreater(len(school_filter.shard_bounds(index)), 2)
+        expected = index.filter_school_data(**query)
+        actual = school_filter.filter_school_data(index, binary_path, path, display_names=False, **query)
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def test_default_ranking_filter_is_sharded_when_enabled(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'all-school-scores-final-March-1-2024')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(GoldenOutputTests.build_snapshot_data(), file)
+        ColumnarIndex.from_school_items(FileUtils.iter_json_object_items(path)).save(
+            FileUtils.get_binary_index_path(path, os.path.join(directory, 'binary')), source_path=path)
+        snapshot = SnapshotCache(FileUtils(), file_dir=directory).get()
+        self.assertEqual(snapshot.load_stats['mode'], 'binary')
+
+        expected = filter_snapshot_data(conferences, 1970, get_current_year(), snapshot, include_breakdown=False,
+                                        display_names=True)
+        school_filter = ShardedSchoolFilter(workers=2, min_cells=0)
+        self.addCleanup(school_filter.shutdown)
+        sharded = mock.Mock(wraps=school_filter.filter_school_data)
+        with mock.patch('comp_sys_site.services.data_getters.school_filter', school_filter), \
+                mock.patch.object(school_filter, 'filter_school_data', sharded):
+            actual = filter_snapshot_data(conferences, 1970, get_current_year(), snapshot, include_breakdown=False,
+                                          display_names=True)
+        sharded.assert_called_once()
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+
+class FixedPointScoreTests(SimpleTestCase):
+    def test_score_sums_are_exact(self):
+        venue_data = {'2001': {'score': 0.1, 'year_paper_count': 1}, '2002': {'score': 0.2, 'year_paper_count': 2}}
+        data = {'school': {'author_count': 1, 'authors': {'Author': {
+            'paper_count': 3, 'dblp_link': None, 'area_paper_counts': {'databases': {'VLDB': venue_data}}
+        }}}}
+        index = ColumnarIndex.from_school_data(data)
+        self.assertEqual(index.score_scale, 10)
+
+        school_data = index.filter_school_data(['VLDB'], {'databases'}, 2000, 2010)['school']
+        self.assertEqual(school_data['area_scores'], {'databases': 0.3})
+        self.assertEqual(school_data['authors']['Author']['databases'], 0.3)
+        totals = VenueMatrices(index).filter_school_totals(['VLDB'], {'databases'}, 2000, 2010)['school']
+        self.assertEqual(totals['area_scores'], {'databases': 0.3})
+
+    def test_scores_with_more_decimals_are_not_rounded(self):
+        venue_data = {str(year): {'score': 1 / 3, 'year_paper_count': 1} for year in range(2001, 2004)}
+        data = {'school': {'author_count': 1, 'authors': {'Author': {
+            'paper_count': 3, 'dblp_link': None, 'area_paper_counts': {'databases': {'VLDB': venue_data}}
+        }}}}
+        index = ColumnarIndex.from_school_data(data)
+        self.assertFalse(index.exact_scores)
+
+        school_data = index.filter_school_data(['VLDB'], {'databases'}, 2000, 2010)['school']
+        self.assertAlmostEqual(school_data['area_scores']['databases'], 1.0, places=12)
+        totals = VenueMatrices(index).filter_school_totals(['VLDB'], {'databases'}, 2002, 2003)['school']
+        self.assertAlmostEqual(totals['area_scores']['databases'], 2 / 3, places=12)
+
+
+class SchoolRecordsTests(SimpleTestCase):
+    def test_records_project_snapshot(self):
+        venue_data = {'2001': {'score': 0.5, 'year_paper_count': 1}, '2003': {'score': 1.25, 'year_paper_count': 2}}
+        data = {'school': {'author_count': 2, 'authors': {
+            'Author': {'paper_count': 3, 'dblp_link': 'https://dblp.org/pid/1',
+                       'area_paper_counts': {'databases': {'VLDB': venue_data}}},
+            'Other': {'paper_count': 1, 'area_paper_counts': {'operating_systems': {'SOSP': {
+                '2010': {'score': 1.0, 'year_paper_count': 1}}}}}
+        }}}
+        records = SchoolRecords(ColumnarIndex.from_school_data(data))
+        self.assertEqual(list(records), ['school'])
+        self.assertEqual([author.name for author in records['school'].authors], ['Author', 'Other'])
+        self.assertEqual(records['school'].author_count, 2)
+        self.assertRaises(KeyError, records.__getitem__, 'missing')
+        self.assertEqual(records.to_dict(), data)
+
+
+class VenueMatricesTests(SimpleTestCase):
+    def setUp(self):
+        self.index = ColumnarIndex.from_school_data(GoldenOutputTests.build_snapshot_data())
+        self.matrices = VenueMatrices(self.index)
+
+    def test_school_totals_match_index(self):
+        for confs, low_year, high_year in GoldenOutputTests().queries():
+            areas = {CategorizeVenue().categorize_venue(conf) for conf in confs}
+            expected = self.index.filter_school_data(confs, areas, low_year, high_year, include_breakdown=False)
+            actual = self.matrices.filter_school_totals(confs, areas, low_year, high_year)
+            self.assertEqual(list(actual), list(expected))
+            for school, data in expected.items():
+                # compared as JSON, so the order of the area keys counts too
+                self.assertEqual(json.dumps(actual[school]),
+                                 json.dumps({key: value for key, value in data.items() if key != 'authors'}))
+
+    def test_area_order_follows_the_selected_cells(self):
+        def venue_data(year):
+            return {str(year): {'score': 1.0, 'year_paper_count': 1}}
+
+        # the first author's operating_systems cell comes first in the index, but is outside the query
+        data = {'school': {'author_count': 2, 'authors': {
+            'First': {'paper_count': 2, 'area_paper_counts': {'operating_systems': {'OSDI': venue_data(2001)},
+                                                              'databases': {'VLDB': venue_data(2001)}}},
+            'Second': {'paper_count': 1, 'area_paper_counts': {'operating_systems': {'SOSP': venue_data(2001)}}}
+        }}}
+        confs, areas = ['VLDB', 'SOSP'], {'databases', 'operating_systems'}
+        expected = ReferencePipeline().filter_school_data(copy.deepcopy(data), confs, areas, 1970, 2020)['school']
+        self.assertEqual(list(expected['area_scores']), ['databases', 'operating_systems'])
+
+        actual = VenueMatrices(ColumnarIndex.from_school_data(data)).filter_school_totals(confs, areas, 1970, 2020)
+        self.assertEqual(json.dumps(actual['school']),
+                         json.dumps({key: value for key, value in expected.items() if key != 'authors'}))
+
+    def test_toggling_an_area_computes_one_column(self):
+        confs = ['ASPLOS', 'ISCA', 'SOSP', 'OSDI', 'VLDB']
+        areas = {'computer_architecture', 'operating_systems', 'databases'}
+        self.matrices.area_totals(confs, areas, 1980, 2020)
+        columns = dict(self.matrices._columns)
+
+        toggled = self.matrices.area_totals(confs[:-1], areas - {'databases'}, 1980, 2020)
+        new_columns = [key for key in self.matrices._columns if key not in columns]
+        self.assertEqual(new_columns, [(self.index.area_ids['databases'], (), 1980, 2020)])
+        self.assertFalse(toggled[:, :, self.index.area_ids['databases']].any())
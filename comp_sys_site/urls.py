@@ -3,5 +3,8 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
-    path('get_author_pub_distribution/', views.get_author_pub_distribution, name='get_author_pub_distribution')
+    path('get_author_pub_distribution/', views.get_author_pub_distribution, name='get_author_pub_distribution'),
+    path('api/rankings', views.api_rankings, name='api_rankings'),
+    path('api/rankings/authors', views.api_institution_authors, name='api_institution_authors'),
+    path('api/rankings/breakdown', views.api_institution_breakdown, name='api_institution_breakdown')
 ]
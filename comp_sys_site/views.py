@@ -1,16 +1,24 @@
-import json
-from django.http import JsonResponse
+from urllib.parse import urlencode
+
+from django.http import HttpResponseRedirect, JsonResponse
 
 from comp_sys_site.services.all_conferences import conferences
-from comp_sys_site.services.file_utils import file_utilities
-from comp_sys_site.services.data_processing import data_processor
 from comp_sys_site.services.date_time_utils import get_current_year
-from comp_sys_site.services.data_getters import get_required_data, get_author_pub_distribution_data
+from comp_sys_site.services.data_getters import get_author_pub_distribution_data, get_default_ranking_json, \
+    get_ranking, get_ranking_page_payload, get_institution_authors_payload, get_institution_breakdown_payload, \
+    get_current_snapshot
+from comp_sys_site.services.http_cache import REVALIDATE, encode_payload, payload_response
+from comp_sys_site.services.result_cache import ResultCache
+from comp_sys_site.services.serializers import json_serializer
 from django.shortcuts import render
 import logging
 
 template_dir = 'comp_sys_site/'
 ROW_LIMIT = 300
+# API URLs carry the snapshot and payload format versions, so a response never changes for its URL
+API_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# bump whenever the JSON of an API response changes shape, so no client reuses a response cached under an old URL
+API_FORMAT_VERSION = 1
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,37 +33,148 @@ def get_author_pub_distribution(request):
         # Retrieve the publication distribution data for the specified author
         pub_distribution = get_author_pub_distribution_data(institution, author)
 
-        return JsonResponse({'pub_distribution': pub_distribution})
+        payload = encode_payload(json_serializer.dumps({'pub_distribution': pub_distribution}))
+        return payload_response(request, payload)
+
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+def get_int_param(params, name, default, low, high):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return min(max(value, low), high)
+
+
+def get_year_range(params, start_name, end_name, current_year):
+    """
+    Reads the start and end years of a ranking query, which must be integers with 1970 <= start <= end <= current_year,
+    so every query has one form and never reaches the index with a year it cannot hold.
+
+    :raises ValueError: If a year is not an integer, out of range, or the range is inverted.
+    """
+    start_year = int(params.get(start_name, 1970))
+    end_year = int(params.get(end_name, current_year))
+    if not 1970 <= start_year <= end_year <= current_year:
+        raise ValueError(f"Invalid year range {start_year}..{end_year}")
+    return start_year, end_year
+
+
+def get_ranking_filters(params, current_year):
+    """:raises ValueError: If the years are invalid, see get_year_range."""
+    selected_conferences = params.getlist('areas[]')
+    start_year, end_year = get_year_range(params, 'start_year', 'end_year', current_year)
+    return selected_conferences, start_year, end_year
+
+
+def get_api_filters(params, current_year):
+    """
+    Reads the filters of a GET API request in their canonical form: the sorted, de-duplicated conferences of the
+    comma-separated areas parameter (every conference when it is missing) and the from and to years.
+
+    :raises ValueError: If the years are invalid, see get_year_range.
+    """
+    selected_conferences = params['areas'].split(',') if 'areas' in params else conferences
+    return ResultCache.make_key(selected_conferences, *get_year_range(params, 'from', 'to', current_year))
+
+
+def get_api_query(filters) -> list:
+    selected_conferences, start_year, end_year = filters
+    return [('areas', ','.join(selected_conferences)), ('from', start_year), ('to', end_year)]
+
+
+def get_api_version(snapshot) -> str:
+    """Returns the v parameter of the API URLs: the payload format version and the snapshot's content version."""
+    return f'{API_FORMAT_VERSION}.{snapshot.version}'
+
+
+def api_payload_response(request, query: list, snapshot, compute_payload):
+    """
+    Answers a GET API request from its canonical URL, whose query string lists the parameters in a fixed order and
+    ends with the version from get_api_version. Any other form of the same query, including one with an outdated
+    version, is redirected to the canonical URL, so every cache sees one URL per query, snapshot and payload format and
+    can keep it for a year.
+
+    :param query: The canonical (name, value) pairs of the request, without the version.
+    :param snapshot: The snapshot the response is computed from.
+    :param compute_payload: Returns the EncodedPayload of the response.
+    """
+    if snapshot is not None:
+        query = query + [('v', get_api_version(snapshot))]
+    canonical_query = urlencode(query)
+    if request.META.get('QUERY_STRING', '') != canonical_query:
+        response = HttpResponseRedirect(f'{request.path}?{canonical_query}')
+        response['Cache-Control'] = REVALIDATE
+        return response
+
+    cache_control = API_CACHE_CONTROL if snapshot is not None else REVALIDATE
+    return payload_response(request, compute_payload(), cache_control=cache_control)
+
+
+def api_rankings(request):
+    if request.method == 'GET':
+        try:
+            filters = get_api_filters(request.GET, get_current_year())
+        except ValueError:
+            return JsonResponse({'error': 'Invalid year'}, status=400)
+        offset = get_int_param(request.GET, 'offset', 0, 0, 100000)
+        limit = get_int_param(request.GET, 'limit', ROW_LIMIT, 1, ROW_LIMIT)
+
+        snapshot = get_current_snapshot()
+        query = get_api_query(filters) + [('offset', offset), ('limit', limit)]
+        return api_payload_response(request, query, snapshot,
+                                    lambda: get_ranking_page_payload(*filters, offset, limit, snapshot))
 
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+def institution_api_response(request, get_payload):
+    if request.method == 'GET':
+        try:
+            filters = get_api_filters(request.GET, get_current_year())
+        except ValueError:
+            return JsonResponse({'error': 'Invalid year'}, status=400)
+        institution = request.GET.get('institution', '')
+
+        snapshot = get_current_snapshot()
+        if institution not in get_ranking(*filters, snapshot).school_data:
+            return JsonResponse({'error': 'Unknown institution'}, status=404)
+        query = get_api_query(filters) + [('institution', institution)]
+        return api_payload_response(request, query, snapshot, lambda: get_payload(*filters, institution, snapshot))
+
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+def api_institution_authors(request):
+    return institution_api_response(request, get_institution_authors_payload)
+
+
+def api_institution_breakdown(request):
+    return institution_api_response(request, get_institution_breakdown_payload)
+
+
 def home(request):
     template = f'{template_dir}home.html'
     current_year = get_current_year()
     year_range = range(1970, current_year + 1)
 
     if request.method == 'POST':
-        selected_conferences = request.POST.getlist('areas[]')
-        start_year = int(request.POST.get('start_year', 1970))
-        end_year = int(request.POST.get('end_year', current_year))
-        sorted_school_ranks = get_required_data(selected_conferences, start_year, end_year)
-        data_processor.convert_decimals_to_float(sorted_school_ranks)
-        data_processor.filter_author_areas(sorted_school_ranks)
-        return JsonResponse({'sorted_ranks': sorted_school_ranks})
-
-    # Get current ranking data
-    sorted_school_ranks = get_required_data(conferences, 1970, current_year)
-
-    # Convert Decimal objects to float
-    data_processor.convert_decimals_to_float(sorted_school_ranks)
-    data_processor.filter_author_areas(sorted_school_ranks)
-    file_utilities.write_formatted_json(data_dict=sorted_school_ranks)
+        try:
+            selected_conferences, start_year, end_year = get_ranking_filters(request.POST, current_year)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid year'}, status=400)
+        offset = get_int_param(request.POST, 'offset', 0, 0, 100000)
+        limit = get_int_param(request.POST, 'limit', ROW_LIMIT, 1, ROW_LIMIT)
+        payload = get_ranking_page_payload(selected_conferences, start_year, end_year, offset, limit)
+        return payload_response(request, payload)
 
+    # The default ranking only changes with the snapshot, so its first page is computed and serialized once
+    snapshot = get_current_snapshot()
     context = {
-        'sorted_ranks': json.dumps(sorted_school_ranks),
+        'sorted_ranks': get_default_ranking_json(ROW_LIMIT, snapshot),
+        'ranking_version': get_api_version(snapshot) if snapshot else '',
         'selected_areas': conferences,
         'year_range': year_range
     }
     return render(request, template, context)
-